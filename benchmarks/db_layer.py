@@ -0,0 +1,189 @@
+"""Updates/sec of the original per-call sqlite3 layer versus the pooled async one.
+
+Simulated users send /log_water concurrently: every update logs a drink and
+reads the daily summary, as the handler does. The "before" layer is the
+original crud.py: a new sqlite3.connect per statement, executed right on the
+event loop, with summaries computed by DATE(timestamp) over the raw logs.
+Both databases are seeded with the same log history. Event loop lag shows
+how long every other user waits behind a blocking call:
+
+    python -m benchmarks.db_layer --users 100 --updates 5000 --history 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+FIRST_USER_ID = 1_000_000
+
+# Схема и запросы исходного crud.py
+BASELINE_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY, username TEXT, weight INTEGER, height INTEGER, age INTEGER,
+        activity INTEGER, city TEXT, water_goal INTEGER, calorie_goal INTEGER)''',
+    '''CREATE TABLE IF NOT EXISTS water_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, timestamp DATETIME, amount_ml FLOAT,
+        FOREIGN KEY(user_id) REFERENCES users(user_id))''',
+    '''CREATE TABLE IF NOT EXISTS food_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, timestamp DATETIME, food TEXT,
+        calories_per_100g FLOAT, grams FLOAT, FOREIGN KEY(user_id) REFERENCES users(user_id))''',
+    '''CREATE TABLE IF NOT EXISTS exercise_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, exercise_type TEXT, timestamp DATETIME,
+        duration_minutes FLOAT, calories_burned FLOAT, FOREIGN KEY(user_id) REFERENCES users(user_id))''',
+)
+
+BASELINE_SUMMARY_QUERIES = {
+    "water_goal": "SELECT water_goal FROM users WHERE user_id = ?",
+    "calorie_goal": "SELECT calorie_goal FROM users WHERE user_id = ?",
+    "total_water_ml": '''SELECT SUM(amount_ml) FROM water_logs
+                         WHERE user_id = ? AND DATE(timestamp) = ? AND amount_ml > 0''',
+    "extra_water": '''SELECT SUM(amount_ml) FROM water_logs
+                      WHERE user_id = ? AND DATE(timestamp) = ? AND amount_ml < 0''',
+    "total_calories_consumed": '''SELECT SUM((calories_per_100g * grams) / 100)
+                                  FROM food_logs WHERE user_id = ? AND DATE(timestamp) = ?''',
+    "total_calories_burned": '''SELECT SUM(calories_burned) FROM exercise_logs
+                                WHERE user_id = ? AND DATE(timestamp) = ?''',
+}
+
+
+def baseline_execute(path, query, params=(), fetchone=False):
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.execute(query, params)
+        result = cursor.fetchone() if fetchone else None
+        conn.commit()
+        return result
+    finally:
+        conn.close()
+
+
+def baseline_update(path, user_id):
+    baseline_execute(path, 'INSERT INTO water_logs (user_id, timestamp, amount_ml) VALUES (?, ?, ?)',
+                     (user_id, datetime.now(), 250.0))
+    today = date.today().isoformat()
+    summary = {}
+    for key, query in BASELINE_SUMMARY_QUERIES.items():
+        params = (user_id, today) if "DATE" in query else (user_id,)
+        summary[key] = baseline_execute(path, query, params, fetchone=True)[0] or 0
+    return summary
+
+
+def history_rows(users, rows):
+    now = datetime.now()
+    for _ in range(rows):
+        timestamp = now - timedelta(minutes=random.randrange(90 * 24 * 60))
+        yield FIRST_USER_ID + random.randrange(users), timestamp, random.choice((250.0, 500.0, -200.0))
+
+
+def seed_baseline(path, users, history):
+    conn = sqlite3.connect(path)
+    for statement in BASELINE_SCHEMA:
+        conn.execute(statement)
+    conn.executemany('INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     [(FIRST_USER_ID + i, "bench", 70, 180, 30, 30, "Moscow", 2500, 2000) for i in range(users)])
+    conn.executemany('INSERT INTO water_logs (user_id, timestamp, amount_ml) VALUES (?, ?, ?)',
+                     history_rows(users, history))
+    conn.commit()
+    conn.close()
+
+
+async def seed_pooled(crud, users, history, batch_size=50_000):
+    for i in range(users):
+        await crud.add_user(FIRST_USER_ID + i, "bench", 70, 180, 30, 30, "Moscow", 2500, 2000)
+    batch = []
+    for user_id, timestamp, amount_ml in history_rows(users, history):
+        values = {"timestamp": timestamp, "day": timestamp.date().isoformat(), "amount_ml": amount_ml}
+        batch.append(("water_logs", user_id, crud.entry_totals("water_logs", values), values))
+        if len(batch) >= batch_size:
+            await crud.pool.run(crud.insert_logs, batch)
+            batch = []
+    if batch:
+        await crud.pool.run(crud.insert_logs, batch)
+
+
+async def run_users(update, users, updates):
+    latencies = []
+    lag = 0.0
+    done = asyncio.Event()
+
+    async def monitor(interval=0.001):
+        # Насколько позже запланированного просыпается таймер: столько ждут все остальные
+        nonlocal lag
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = max(lag, time.perf_counter() - started - interval)
+
+    async def user(index, count):
+        for _ in range(count):
+            started = time.perf_counter()
+            await update(FIRST_USER_ID + index)
+            latencies.append(time.perf_counter() - started)
+
+    monitor_task = asyncio.create_task(monitor())
+    started = time.perf_counter()
+    await asyncio.gather(*(user(index, updates // users) for index in range(users)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await monitor_task
+    return elapsed, sorted(latencies), lag
+
+
+def report(name, elapsed, latencies, lag):
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{name}: {len(latencies) / elapsed:.0f} updates/s, p50 {p50:.1f} ms, p99 {p99:.1f} ms, "
+          f"max event loop lag {lag * 1000:.1f} ms")
+
+
+async def benchmark_before(path, args):
+    seed_baseline(path, args.users, args.history)
+
+    async def update(user_id):
+        # Исходные обработчики вызывали синхронный crud прямо из корутины
+        baseline_update(path, user_id)
+
+    report("before (sqlite3.connect per call)", *await run_users(update, args.users, args.updates))
+
+
+async def benchmark_after(path, args):
+    from bot.db import crud
+    from bot.db.pool import create_pool
+
+    crud.pool = create_pool(path, args.pool_size, crud.SQLITE_PRAGMAS)
+    crud.invalidate_profiles()
+    try:
+        await crud.create_db()
+        await seed_pooled(crud, args.users, args.history)
+
+        async def update(user_id):
+            await crud.log_water(user_id, 250)
+            await crud.get_daily_summary(user_id)
+
+        report("after (pooled async layer)", *await run_users(update, args.users, args.updates))
+    finally:
+        await crud.close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--history", type=int, default=200_000, help="log rows already in the database")
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    # crud создает пул при импорте, поэтому ему нужен хоть какой-то адрес
+    os.environ.setdefault("DATABASE_URL", os.path.join(tmp_dir.name, "default.db"))
+    asyncio.run(benchmark_before(os.path.join(tmp_dir.name, "before.db"), args))
+    asyncio.run(benchmark_after(os.path.join(tmp_dir.name, "after.db"), args))
+    tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
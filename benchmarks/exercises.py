@@ -0,0 +1,93 @@
+"""Lookup speed and accuracy of the exercise catalog index.
+
+Builds the index from the catalog and runs a synthetic query set: exact
+names and aliases, typos, extra words around the name, shuffled words and
+random noise that should not match anything:
+
+    python -m benchmarks.exercises --queries 100000
+"""
+import argparse
+import random
+import time
+
+from bot.utils.exercises import ExerciseIndex, normalize_exercise, read_catalog
+from config.config import EXERCISE_CATALOG_PATH, EXERCISE_MATCH_THRESHOLD
+
+LETTERS = "абвгдежзийклмнопрстуфхцчшщыьэюя"
+EXTRA_WORDS = ("утренний", "легкий", "вечерняя", "в парке", "с другом", "интенсивно", "дома")
+
+
+def typo(text, edits):
+    chars = list(text)
+    for _ in range(edits):
+        position = random.randrange(len(chars))
+        kind = random.randrange(4)
+        if kind == 0 and len(chars) > 3:
+            del chars[position]
+        elif kind == 1:
+            chars.insert(position, random.choice(LETTERS))
+        elif kind == 2:
+            chars[position] = random.choice(LETTERS)
+        elif position + 1 < len(chars):
+            chars[position], chars[position + 1] = chars[position + 1], chars[position]
+    return "".join(chars)
+
+
+def make_query(keys):
+    # (запрос, ожидаемое упражнение или None, вид запроса)
+    key, exercise = random.choice(keys)
+    kind = random.choice(("exact", "typo", "extra words", "shuffled", "noise"))
+    if kind == "exact":
+        return key.upper() if random.random() < 0.5 else key, exercise, kind
+    if kind == "typo":
+        return typo(key, 1 if len(key) < 8 else 2), exercise, kind
+    if kind == "extra words":
+        return f"{random.choice(EXTRA_WORDS)} {key}", exercise, kind
+    if kind == "shuffled":
+        words = key.split()
+        random.shuffle(words)
+        return " ".join(words), exercise, kind
+    return "".join(random.choice(LETTERS) for _ in range(random.randint(4, 12))), None, kind
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--catalog", default=EXERCISE_CATALOG_PATH)
+    parser.add_argument("--queries", type=int, default=100_000)
+    parser.add_argument("--threshold", type=float, default=EXERCISE_MATCH_THRESHOLD)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    catalog = list(read_catalog(args.catalog))
+    started = time.perf_counter()
+    index = ExerciseIndex(catalog, args.threshold)
+    print(f"built index of {len(index)} exercises in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    keys = {}
+    for name, met, aliases in catalog:
+        for alias in (name, *aliases):
+            keys.setdefault(normalize_exercise(alias), (name, met))
+    keys = list(keys.items())
+    queries = [make_query(keys) for _ in range(args.queries)]
+    latencies = []
+    results = {}
+    started = time.perf_counter()
+    for query, expected, kind in queries:
+        query_started = time.perf_counter()
+        found = index.search(query)
+        latencies.append(time.perf_counter() - query_started)
+        correct, total = results.get(kind, (0, 0))
+        results[kind] = (correct + (found == expected), total + 1)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1_000_000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1_000_000
+    print(f"{len(queries) / elapsed:.0f} lookups/s, p50 {p50:.0f} us, p99 {p99:.0f} us, max {latencies[-1] * 1_000_000:.0f} us")
+    for kind, (correct, total) in results.items():
+        print(f"{kind}: {correct / total:.1%} correct of {total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Memory and throughput benchmark for streaming log export and import.
+
+Fills a temporary database with synthetic log rows, exports them, and
+imports the export into a second database. Peak Python memory is reported
+for both steps:
+
+    python -m benchmarks.export --rows 2000000 --format jsonl
+
+With --database-url the import goes into that database instead (its log
+tables are emptied first, use a scratch one), and the rows are exported
+again from it through the bot's pool, e.g. to check that asyncpg streams:
+
+    python -m benchmarks.export --rows 2000000 --database-url postgresql+asyncpg://...
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+
+def fill_database(path, rows, users, batch_size=50_000):
+    from bot.db.crud import LOG_COLUMNS
+
+    conn = sqlite3.connect(path)
+    started = datetime(2020, 1, 1)
+    tables = list(LOG_COLUMNS)
+    generated = 0
+    while generated < rows:
+        batches = {table: [] for table in tables}
+        for _ in range(min(batch_size, rows - generated)):
+            user_id = random.randrange(users)
+            timestamp = started + timedelta(minutes=random.randrange(3 * 365 * 24 * 60))
+            day = timestamp.date().isoformat()
+            table = random.choice(tables)
+            if table == "water_logs":
+                batches[table].append((user_id, timestamp, day, random.choice((250.0, 500.0, -200.0))))
+            elif table == "food_logs":
+                batches[table].append((user_id, timestamp, day, "банан", 89.0, 150.0))
+            else:
+                batches[table].append((user_id, timestamp, day, "бег", 30.0, 300.0))
+            generated += 1
+        for table, params in batches.items():
+            columns = ", ".join(LOG_COLUMNS[table])
+            placeholders = ", ".join(["?"] * (len(LOG_COLUMNS[table]) + 1))
+            conn.executemany(f"INSERT INTO {table} (user_id, {columns}) VALUES ({placeholders})", params)
+        conn.commit()
+    conn.close()
+
+
+def measure(func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def export_from(url, dump, fmt):
+    from bot.db.export import export_logs
+    from bot.db.pool import create_pool
+
+    async def run():
+        pool = create_pool(url, 1, {})
+        try:
+            with open(dump, "w", encoding="utf-8", newline="") as stream:
+                return await pool.read(export_logs, stream, fmt)
+        finally:
+            await pool.aclose()
+
+    return asyncio.run(run())
+
+
+def import_into(url, dump, fmt, users):
+    from bot.db.export import import_logs
+    from bot.db.migrations import LOG_TABLES, migrate
+    from bot.db.pool import create_pool
+
+    def prepare(conn):
+        for table in LOG_TABLES + ("daily_totals",):
+            conn.execute(f"DELETE FROM {table}")
+        # Серверная СУБД проверяет внешние ключи логов, поэтому пользователи нужны заранее
+        conn.executemany("INSERT INTO users (user_id) VALUES (?) ON CONFLICT (user_id) DO NOTHING",
+                         [(user_id,) for user_id in range(users)])
+        conn.commit()
+
+    async def run():
+        pool = create_pool(url, 1, {})
+        try:
+            await migrate(pool)
+            await pool.run(prepare)
+            with open(dump, "r", encoding="utf-8", newline="") as stream:
+                return await pool.run(import_logs, stream, fmt)
+        finally:
+            await pool.aclose()
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="jsonl")
+    parser.add_argument("--database-url", help="import into and export from this database, SQLite by default")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    source = os.path.join(tmp_dir.name, "source.db")
+    target = os.path.join(tmp_dir.name, "target.db")
+    dump = os.path.join(tmp_dir.name, f"logs.{args.format}")
+    os.environ["DATABASE_URL"] = source
+
+    from bot.db import crud
+    from bot.db.export import export_logs, import_logs
+
+    asyncio.run(crud.create_db())
+    asyncio.run(crud.close_db())
+    # Пустая схема копируется заранее и служит базой для импорта
+    shutil.copyfile(source, target)
+    fill_database(source, args.rows, args.users)
+
+    def run_export():
+        conn = sqlite3.connect(source)
+        try:
+            with open(dump, "w", encoding="utf-8", newline="") as stream:
+                return export_logs(conn, stream, args.format)
+        finally:
+            conn.close()
+
+    count, elapsed, peak = measure(run_export)
+    print(f"export: {count} rows in {elapsed:.1f}s ({count / elapsed:.0f} rows/s), peak {peak / 2**20:.1f} MiB")
+
+    def run_import():
+        conn = sqlite3.connect(target)
+        try:
+            with open(dump, "r", encoding="utf-8", newline="") as stream:
+                return import_logs(conn, stream, args.format)
+        finally:
+            conn.close()
+
+    if args.database_url:
+        count, elapsed, peak = measure(lambda: import_into(args.database_url, dump, args.format, args.users))
+    else:
+        count, elapsed, peak = measure(run_import)
+    print(f"import: {count} rows in {elapsed:.1f}s ({count / elapsed:.0f} rows/s), peak {peak / 2**20:.1f} MiB")
+
+    if args.database_url:
+        redump = os.path.join(tmp_dir.name, f"again.{args.format}")
+        count, elapsed, peak = measure(lambda: export_from(args.database_url, redump, args.format))
+        print(f"export from {args.database_url.split(':', 1)[0]}: {count} rows in {elapsed:.1f}s "
+              f"({count / elapsed:.0f} rows/s), peak {peak / 2**20:.1f} MiB")
+    tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
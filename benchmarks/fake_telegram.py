@@ -0,0 +1,112 @@
+"""Local stand-in for Telegram used to load test the webhook mode.
+
+Start the bot with BOT_MODE=webhook and TELEGRAM_API_URL pointing at this
+script's Bot API port, then run:
+
+    python -m benchmarks.fake_telegram --users 200 --messages 20
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+import aiohttp
+from aiohttp import web
+
+MESSAGE_TEXTS = ("/log_water 250", "/check_progress")
+
+
+class FakeTelegram:
+    def __init__(self):
+        self._message_ids = itertools.count(1)
+        self._update_ids = itertools.count(1)
+        self._replies = {}
+        self.api_calls = 0
+
+    async def handle_api(self, request: web.Request) -> web.Response:
+        self.api_calls += 1
+        method = request.match_info["method"].lower()
+        data = await request.post()
+        if method not in ("sendmessage", "editmessagetext"):
+            return web.json_response({"ok": True, "result": True})
+
+        chat_id = int(data["chat_id"])
+        waiter = self._replies.pop(chat_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(time.perf_counter())
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": data.get("text", ""),
+        }
+        return web.json_response({"ok": True, "result": message})
+
+    def make_update(self, user_id, text):
+        return {
+            "update_id": next(self._update_ids),
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+                "text": text,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+            },
+        }
+
+    async def send(self, session, webhook_url, user_id, text, secret):
+        waiter = asyncio.get_running_loop().create_future()
+        self._replies[user_id] = waiter
+        headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+        started = time.perf_counter()
+        async with session.post(webhook_url, json=self.make_update(user_id, text), headers=headers) as response:
+            response.raise_for_status()
+        return await asyncio.wait_for(waiter, timeout=30) - started
+
+
+async def simulate_user(telegram, session, args, user_id, latencies):
+    for i in range(args.messages):
+        text = MESSAGE_TEXTS[i % len(MESSAGE_TEXTS)]
+        latencies.append(await telegram.send(session, args.webhook, user_id, text, args.secret))
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+async def main(args):
+    telegram = FakeTelegram()
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", telegram.handle_api)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.api_port).start()
+
+    latencies = []
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(
+            simulate_user(telegram, session, args, args.first_user_id + i, latencies)
+            for i in range(args.users)
+        ))
+    elapsed = time.perf_counter() - started
+    await runner.cleanup()
+
+    print(f"updates: {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.1f} updates/s)")
+    print(
+        f"latency ms: p50={percentile(latencies, 50) * 1000:.1f} "
+        f"p95={percentile(latencies, 95) * 1000:.1f} "
+        f"p99={percentile(latencies, 99) * 1000:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--webhook", default="http://127.0.0.1:8000/webhook")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--first-user-id", type=int, default=1_000_000)
+    parser.add_argument("--secret")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,247 @@
+"""End-to-end load benchmark for the bot handlers.
+
+Drives the real dispatcher and router with synthetic updates from N
+concurrent users. Telegram, OpenFoodFacts and OpenWeatherMap are replaced
+with local fakes with configurable latency. Results are written as JSON:
+
+    python -m benchmarks.load --users 100 --rounds 5 --upstream-latency-ms 50
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from aiohttp import web
+
+API_PORT = 8081
+BOT_ID = 42
+PROFILE_STEPS = (
+    ("/set_profile", "/set_profile"),
+    ("/set_profile", "70"),
+    ("/set_profile", "180"),
+    ("/set_profile", "30"),
+    ("/set_profile", "45"),
+    ("/set_profile", "Порту"),
+    ("/set_profile", "callback:calorie_goal_yes"),
+    ("/set_profile", "callback:water_goal_yes"),
+)
+ROUND_STEPS = (
+    ("/log_water", "/log_water 250"),
+    ("/log_food", "/log_food банан"),
+    ("/log_food", "150"),
+    ("/log_workout", "/log_workout бег 30"),
+    ("/check_progress", "/check_progress"),
+)
+
+
+class FakeUpstreams:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = defaultdict(int)
+        self._message_ids = itertools.count(1)
+
+    async def _delay(self, name):
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def bot_api(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        await self._delay(f"telegram.{method}")
+        data = await request.post()
+        if method not in ("sendmessage", "editmessagetext"):
+            return web.json_response({"ok": True, "result": True})
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(data["chat_id"]), "type": "private"},
+            "from": {"id": BOT_ID, "is_bot": True, "first_name": "bot"},
+            "text": data.get("text", ""),
+        }
+        return web.json_response({"ok": True, "result": message})
+
+    async def food_search(self, request: web.Request) -> web.Response:
+        await self._delay("openfoodfacts")
+        name = request.query.get("search_terms", "")
+        return web.json_response({"products": [{"product_name": name, "nutriments": {"energy-kcal_100g": 89}}]})
+
+    async def forecast(self, request: web.Request) -> web.Response:
+        await self._delay("openweathermap")
+        return web.json_response({"list": [{"main": {"temp": 20}}, {"main": {"temp": 27}}]})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.bot_api)
+        app.router.add_get("/cgi/search.pl", self.food_search)
+        app.router.add_get("/data/2.5/forecast", self.forecast)
+        return app
+
+
+class UpdateFactory:
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def make(self, user_id, text):
+        user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+        chat = {"id": user_id, "type": "private"}
+        if text.startswith("callback:"):
+            return {
+                "update_id": next(self._ids),
+                "callback_query": {
+                    "id": str(next(self._ids)),
+                    "from": user,
+                    "chat_instance": str(user_id),
+                    "data": text.removeprefix("callback:"),
+                    "message": {
+                        "message_id": next(self._ids),
+                        "date": int(time.time()),
+                        "chat": chat,
+                        "from": {"id": BOT_ID, "is_bot": True, "first_name": "bot"},
+                        "text": "",
+                    },
+                },
+            }
+        message = {
+            "message_id": next(self._ids),
+            "date": int(time.time()),
+            "chat": chat,
+            "from": user,
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": next(self._ids), "message": message}
+
+
+def summarize(values, elapsed):
+    values = sorted(values)
+    quantiles = statistics.quantiles(values, n=100) if len(values) > 1 else values * 99
+    return {
+        "count": len(values),
+        "throughput": len(values) / elapsed,
+        "mean_ms": statistics.fmean(values) * 1000,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args):
+    from aiogram import types
+    from aiogram.dispatcher.event.bases import UNHANDLED
+    from bot.handlers import settings_handler
+
+    dp, bot = settings_handler.dp, settings_handler.bot
+    await settings_handler.start_services()
+
+    upstreams = FakeUpstreams(args.upstream_latency_ms / 1000)
+    runner = web.AppRunner(upstreams.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.api_port).start()
+
+    factory = UpdateFactory()
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+
+    async def feed(user_id, command, text):
+        update = types.Update.model_validate(factory.make(user_id, text), context={"bot": bot})
+        started = time.perf_counter()
+        try:
+            result = await dp.feed_update(bot, update)
+        except Exception:
+            result = None
+            errors[command] += 1
+        if result is UNHANDLED:
+            # Апдейт не дошел до хендлера: нет подходящего фильтра или его отбросил троттлинг
+            errors[command] += 1
+        latencies[command].append(time.perf_counter() - started)
+
+    async def simulate_user(user_id):
+        if not args.skip_profile:
+            for command, text in PROFILE_STEPS:
+                await feed(user_id, command, text)
+        for _ in range(args.rounds):
+            for command, text in ROUND_STEPS:
+                await feed(user_id, command, text)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(simulate_user(args.first_user_id + i) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    # Очередь исходящих сообщений дописывается, пока фейковый Bot API еще работает
+    await settings_handler.on_shutdown()
+    await runner.cleanup()
+    await bot.session.close()
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "config": {
+            "users": args.users,
+            "rounds": args.rounds,
+            "upstream_latency_ms": args.upstream_latency_ms,
+            "skip_profile": args.skip_profile,
+        },
+        "elapsed_s": elapsed,
+        "total": summarize(all_latencies, elapsed),
+        "commands": {command: summarize(values, elapsed) for command, values in latencies.items()},
+        "errors": dict(errors),
+        "upstream_calls": dict(upstreams.calls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--upstream-latency-ms", type=float, default=20)
+    parser.add_argument("--api-port", type=int, default=API_PORT)
+    parser.add_argument("--first-user-id", type=int, default=1_000_000)
+    parser.add_argument("--skip-profile", action="store_true", help="skip the /set_profile flow")
+    parser.add_argument("--database", help="SQLite file to use, a temporary one by default")
+    parser.add_argument("--output", default="load_results.json")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    base_url = f"http://127.0.0.1:{args.api_port}"
+    # Переменные окружения нужно выставить до импорта конфигурации бота
+    os.environ.setdefault("BOT_TOKEN", f"{BOT_ID}:benchmark")
+    os.environ["DATABASE_URL"] = args.database or os.path.join(tmp_dir.name, "bench.db")
+    os.environ["TELEGRAM_API_URL"] = base_url
+    os.environ["FOOD_SEARCH_URL"] = f"{base_url}/cgi/search.pl"
+    os.environ["WEATHER_FORECAST_URL"] = f"{base_url}/data/2.5/forecast"
+    os.environ["WEATHER_API_KEY"] = "benchmark"
+    # Меряем обработчики, а не лимиты: троттлинг и очередь отправки не должны отбрасывать апдейты
+    for name in ("THROTTLE_RATE", "THROTTLE_BURST", "THROTTLE_UPSTREAM_RATE", "THROTTLE_UPSTREAM_BURST",
+                 "OUTBOX_GLOBAL_RATE", "OUTBOX_CHAT_RATE", "OUTBOX_CHAT_BURST"):
+        os.environ[name] = "1000000"
+
+    result = asyncio.run(run(args))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(f"{result['total']['count']} updates in {result['elapsed_s']:.2f}s "
+          f"({result['total']['throughput']:.1f} updates/s)")
+    for command, stats in sorted(result["commands"].items()):
+        print(f"{command:16} n={stats['count']:<6} p50={stats['p50_ms']:.1f}ms "
+              f"p95={stats['p95_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms")
+    tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
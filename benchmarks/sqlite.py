@@ -0,0 +1,85 @@
+"""Mixed read/write load against the SQLite backend with different journal settings.
+
+Writers log drinks while readers fetch daily summaries at the same time.
+Throughput and tail latency are reported separately for reads and writes:
+
+    python -m benchmarks.sqlite --duration 10 --readers 32 --writers 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.storage import FIRST_USER_ID, seed_users
+
+CONFIGS = {
+    "rollback journal": {"journal_mode": "DELETE", "synchronous": "FULL"},
+    "wal": {"journal_mode": "WAL", "synchronous": "NORMAL"},
+}
+
+
+def describe(name, latencies, elapsed):
+    if not latencies:
+        return f"{name}: no operations"
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    return f"{name} {len(latencies) / elapsed:.0f} ops/s, p50 {p50:.1f} ms, p99 {p99:.1f} ms"
+
+
+async def run_mixed(crud, users, readers, writers, duration):
+    reads, writes = [], []
+    deadline = time.perf_counter() + duration
+
+    async def reader():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await crud.get_daily_summary(FIRST_USER_ID + random.randrange(users))
+            reads.append(time.perf_counter() - started)
+
+    async def writer():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await crud.log_water(FIRST_USER_ID + random.randrange(users), 250)
+            writes.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(reader() for _ in range(readers)), *(writer() for _ in range(writers)))
+    return reads, writes, time.perf_counter() - started
+
+
+async def benchmark(name, path, args):
+    from bot.db import crud
+    from bot.db.pool import create_pool
+
+    crud.pool = create_pool(path, args.pool_size, {**crud.SQLITE_PRAGMAS, **CONFIGS[name]})
+    crud.invalidate_profiles()
+    try:
+        await crud.create_db()
+        await seed_users(crud, args.users)
+        reads, writes, elapsed = await run_mixed(crud, args.users, args.readers, args.writers, args.duration)
+    finally:
+        await crud.close_db()
+    print(f"{name}: {describe('reads', reads, elapsed)}; {describe('writes', writes, elapsed)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--readers", type=int, default=32)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    os.environ.setdefault("DATABASE_URL", os.path.join(tmp_dir.name, "default.db"))
+    for name in CONFIGS:
+        asyncio.run(benchmark(name, os.path.join(tmp_dir.name, f"{name.replace(' ', '_')}.db"), args))
+    tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Weather lookup throughput while OpenFoodFacts is slow.
+
+Starts two local fake upstreams on separate ports: the forecast API answers
+quickly, food search answers after a configurable delay, up to and beyond
+the HTTP timeout. Some users keep fetching forecasts while others wait on
+food search. With the shared non-blocking client, forecast throughput
+should not depend on how slow food search is:
+
+    python -m benchmarks.upstream --slow-ms 0 1000 5000 15000 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+from aiohttp import web
+
+from benchmarks.load import FakeUpstreams
+
+FOOD_PORT = 8091
+WEATHER_PORT = 8092
+
+
+async def start(upstreams, port):
+    runner = web.AppRunner(upstreams.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def run_phase(calculation, slow, slow_ms, args):
+    slow.latency = slow_ms / 1000
+    deadline = time.perf_counter() + args.duration
+    latencies = []
+    food = Counter()
+
+    async def weather_user(index):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            # Напрямую, мимо кеша и объединения запросов: каждый вызов идет в фейковый API
+            await calculation.fetch_weather(f"city{index}")
+            latencies.append(time.perf_counter() - started)
+
+    async def food_user(index):
+        while time.perf_counter() < deadline:
+            try:
+                await calculation.search_food(f"food{index}")
+                food["ok"] += 1
+            except asyncio.TimeoutError:
+                food["timeout"] += 1
+
+    food_tasks = [asyncio.create_task(food_user(index)) for index in range(args.slow_users)]
+    started = time.perf_counter()
+    await asyncio.gather(*(weather_user(index) for index in range(args.fast_users)))
+    elapsed = time.perf_counter() - started
+    # Запросы к медленному API досчитываются до ответа или таймаута
+    await asyncio.gather(*food_tasks)
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"food search {slow_ms:>6.0f} ms: weather {len(latencies) / elapsed:.0f} req/s, "
+          f"p50 {p50:.1f} ms, p99 {p99:.1f} ms; food ok {food['ok']}, timeouts {food['timeout']}")
+
+
+async def run(args):
+    from bot.utils import calculation
+    from bot.utils.http import close_session
+
+    slow = FakeUpstreams(0)
+    fast = FakeUpstreams(args.fast_ms / 1000)
+    runners = [await start(slow, FOOD_PORT), await start(fast, WEATHER_PORT)]
+    try:
+        for slow_ms in args.slow_ms:
+            await run_phase(calculation, slow, slow_ms, args)
+    finally:
+        await close_session()
+        for runner in runners:
+            await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--slow-ms", type=float, nargs="+", default=[0, 1000, 5000, 15000],
+                        help="food search latencies to run, one phase each")
+    parser.add_argument("--fast-ms", type=float, default=20, help="forecast API latency")
+    parser.add_argument("--fast-users", type=int, default=20)
+    parser.add_argument("--slow-users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--timeout", type=float, default=10, help="HTTP_TIMEOUT_SECONDS for the bot client")
+    args = parser.parse_args()
+
+    # Переменные окружения нужно выставить до импорта конфигурации бота
+    os.environ.setdefault("DATABASE_URL", ":memory:")
+    os.environ["WEATHER_API_KEY"] = "benchmark"
+    os.environ["HTTP_TIMEOUT_SECONDS"] = str(args.timeout)
+    os.environ["FOOD_SEARCH_URL"] = f"http://127.0.0.1:{FOOD_PORT}/cgi/search.pl"
+    os.environ["WEATHER_FORECAST_URL"] = f"http://127.0.0.1:{WEATHER_PORT}/data/2.5/forecast"
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import sys
+from datetime import date, timedelta
+from bot.db import crud
+from bot.db.crud import close_db, is_sqlite
+from bot.db.migrations import LOG_TABLES
+from bot.utils.logging import logger
+from config.config import (
+    LOG_RETENTION_DAYS,
+    COMPACTION_BATCH_SIZE,
+    COMPACTION_INTERVAL_SECONDS,
+    VACUUM_PAGES,
+)
+
+
+def _delete_batch(conn, table, cutoff, batch_size):
+    # daily_totals обновляется вместе с каждой вставкой, поэтому старые строки можно просто удалить
+    deleted = conn.execute(f'''DELETE FROM {table} WHERE id IN (
+                                   SELECT id FROM {table} WHERE day < ? ORDER BY id LIMIT ?)''',
+                           (cutoff, batch_size)).rowcount
+    conn.commit()
+    return deleted
+
+
+def _freelist_count(conn):
+    return conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+
+def _incremental_vacuum(conn, pages):
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        return False
+    # Каждый шаг этой прагмы освобождает одну страницу, а execute делает только первый шаг.
+    # executescript у sqlite3 выполняет ее до конца, у соединения SQLAlchemy такого нет
+    executescript = getattr(conn, "executescript", None)
+    if executescript is not None:
+        executescript(f'PRAGMA incremental_vacuum({int(pages)})')
+    else:
+        for _ in range(int(pages)):
+            conn.execute('PRAGMA incremental_vacuum(1)')
+    conn.commit()
+    return True
+
+
+def _enable_incremental_vacuum(conn):
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+
+
+async def compact_logs(retention_days=LOG_RETENTION_DAYS, batch_size=COMPACTION_BATCH_SIZE, pause=0.05):
+    cutoff = (date.today() - timedelta(days=retention_days)).isoformat()
+    total = 0
+    for table in LOG_TABLES:
+        while True:
+            deleted = await crud.pool.run(_delete_batch, table, cutoff, batch_size)
+            total += deleted
+            if deleted < batch_size:
+                break
+            # Отпускаем блокировку записи между пакетами
+            await asyncio.sleep(pause)
+    if total:
+        logger.info(f"Compacted {total} log rows older than {cutoff}")
+    # Страницы возвращаются ОС только в SQLite, серверные СУБД делают это сами
+    while total and is_sqlite():
+        freelist = await crud.pool.read(_freelist_count)
+        if not freelist or not await crud.pool.run(_incremental_vacuum, VACUUM_PAGES):
+            break
+        await asyncio.sleep(pause)
+    return total
+
+
+async def run_compaction():
+    while True:
+        try:
+            # Процессы, которые делят базу, компактируют ее по очереди, а не одновременно
+            async with crud.pool.job_lock("compaction") as locked:
+                if locked:
+                    await compact_logs()
+                else:
+                    logger.info("Log compaction is already running in another process")
+        except Exception as e:
+            logger.error(f"Log compaction failed: {e}")
+        await asyncio.sleep(COMPACTION_INTERVAL_SECONDS)
+
+
+def start_compaction():
+    if LOG_RETENTION_DAYS > 0:
+        return asyncio.create_task(run_compaction())
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Delete raw log rows that are already rolled up into daily_totals.")
+    parser.add_argument("--retention-days", type=int, default=LOG_RETENTION_DAYS or 90)
+    parser.add_argument("--batch-size", type=int, default=COMPACTION_BATCH_SIZE)
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="switch an existing database to incremental auto-vacuum (runs a full VACUUM once)")
+    args = parser.parse_args(argv)
+
+    async def run():
+        try:
+            if args.enable_incremental_vacuum and is_sqlite():
+                await crud.pool.run(_enable_incremental_vacuum)
+            return await compact_logs(args.retention_days, args.batch_size)
+        finally:
+            await close_db()
+
+    print(f"Deleted {asyncio.run(run())} rows")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,84 @@
-import sqlite3
-from datetime import datetime, date
-from config.config import DATABASE_URL
+import time
+from datetime import datetime, date, timedelta
+from collections import defaultdict
+from config.config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_CACHE_SIZE_KB,
+    SQLITE_MMAP_SIZE,
+    SQLITE_BUSY_TIMEOUT_MS,
+    LOG_WRITE_BEHIND,
+    LOG_FLUSH_INTERVAL_MS,
+    LOG_FLUSH_MAX_ROWS,
+    LOG_WRITE_DURABLE,
+    PROFILE_CACHE_SIZE,
+    PROFILE_CACHE_TTL_SECONDS,
+    PROFILE_CACHE_SHARED_TTL_SECONDS,
+)
+from bot.db.pool import LazyPool, create_pool
+from bot.db.migrations import migrate
+from bot.db.writer import LogWriter
+from bot.utils.cache import TTLCache
 from bot.utils.logging import logger
+from bot.utils.metrics import statement_type, track_query
 
+LOG_COLUMNS = {
+    'water_logs': ('timestamp', 'day', 'amount_ml'),
+    'food_logs': ('timestamp', 'day', 'food', 'calories_per_100g', 'grams'),
+    'exercise_logs': ('timestamp', 'day', 'exercise_type', 'duration_minutes', 'calories_burned'),
+}
 
-def execute_query(query, params=(), fetchone=False, fetchall=False):
-    conn = sqlite3.connect(DATABASE_URL)
-    cursor = conn.cursor()
+SUMMARY_TOTALS = {
+    "total_water_ml": "water_ml",
+    "extra_water": "extra_water",
+    "total_calories_consumed": "calories_consumed",
+    "total_calories_burned": "calories_burned",
+}
+
+# Сводки читают только daily_totals по первичному ключу (user_id, day), планы проверяются в тестах
+DAILY_TOTALS_QUERY = '''SELECT water_ml, extra_water, calories_consumed, calories_burned
+                        FROM daily_totals WHERE user_id = ? AND day = ?'''
+TOTALS_RANGE_QUERY = '''SELECT day, water_ml, extra_water, calories_consumed, calories_burned
+                        FROM daily_totals
+                        WHERE user_id = ? AND day BETWEEN ? AND ?
+                        ORDER BY day'''
+
+USER_COLUMNS = ("user_id", "username", "weight", "height", "age", "activity", "city", "water_goal", "calorie_goal",
+                "custom_water_goal")
+
+SQLITE_PRAGMAS = {
+    # Должен идти до journal_mode: переход в WAL записывает заголовок, и файл уже не пустой
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    "synchronous": SQLITE_SYNCHRONOUS,
+    # Отрицательное значение — размер в KiB, а не в страницах
+    "cache_size": -SQLITE_CACHE_SIZE_KB,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "temp_store": "MEMORY",
+}
+
+
+
+def _create_pool():
+    if not DATABASE_URL:
+        raise RuntimeError("DATABASE_URL is not set")
+    return create_pool(DATABASE_URL, DB_POOL_SIZE, SQLITE_PRAGMAS)
+
+
+pool = LazyPool(_create_pool)
+
+_MISSING = object()
+profile_cache = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL_SECONDS)
+_profile_generation = 0
+
+
+def _execute(conn, query, params=(), fetchone=False, fetchall=False):
+    cursor = None
     try:
-        cursor.execute(query, params)
+        cursor = conn.execute(query, params)
         if fetchone:
             result = cursor.fetchone()
         elif fetchall:
@@ -17,120 +87,348 @@ def execute_query(query, params=(), fetchone=False, fetchall=False):
             result = None
         conn.commit()
         return result
-    except sqlite3.Error as e:
+    except Exception as e:
+        conn.rollback()
         logger.error(f"Database error: {e}")
         raise
     finally:
-        conn.close()
+        if cursor is not None:
+            cursor.close()
+
+
+async def execute_query(query, params=(), fetchone=False, fetchall=False):
+    statement = statement_type(query)
+    # SELECT идут в пул читателей, все остальное — через единственного писателя
+    run = pool.read if statement == "SELECT" else pool.run
+    with track_query(statement):
+        return await run(_execute, query, params, fetchone, fetchall)
+
+
+async def close_db():
+    await pool.aclose()
+
+
+def is_sqlite():
+    return pool.dialect == "sqlite"
+
+
+def is_shared():
+    # С файлом SQLite работает один процесс бота, серверную базу могут делить несколько
+    return not is_sqlite()
+
 
+async def create_db(background=False):
+    return await migrate(pool, background)
 
-def create_db():
-    execute_query('''CREATE TABLE IF NOT EXISTS users (
-                        user_id INTEGER PRIMARY KEY,
-                        username TEXT,
-                        weight INTEGER,
-                        height INTEGER,
-                        age INTEGER,
-                        activity INTEGER,
-                        city TEXT,
-                        water_goal INTEGER,
-                        calorie_goal INTEGER)''')
 
+async def get_user_by_id(user_id: int):
+    user = profile_cache.get(user_id, _MISSING)
+    if user is _MISSING:
+        generation = _profile_generation
+        row = await execute_query("SELECT * FROM users WHERE user_id = ?", (user_id,), fetchone=True)
+        user = dict(zip(USER_COLUMNS, row)) if row else None
+        # Если профиль менялся во время чтения, результат может быть устаревшим
+        if generation == _profile_generation:
+            profile_cache.set(user_id, user, ttl=PROFILE_CACHE_SHARED_TTL_SECONDS if is_shared() else None)
+    return dict(user) if user else None
 
-def get_user_by_id(user_id: int):
-    row = execute_query("SELECT * FROM users WHERE user_id = ?", (user_id,), fetchone=True)
-    if row:
-        keys = ["user_id", "username", "weight", "height", "age", "activity", "city", "water_goal", "calorie_goal"]
-        return dict(zip(keys, row))
-    return None
 
+def _invalidate_profile(user_id):
+    global _profile_generation
+    _profile_generation += 1
+    profile_cache.pop(user_id)
 
-def add_user(user_id, username, weight, height, age, activity, city, water_goal, calorie_goal):
+
+def invalidate_profiles():
+    global _profile_generation
+    _profile_generation += 1
+    profile_cache.clear()
+
+
+async def add_user(user_id, username, weight, height, age, activity, city, water_goal, calorie_goal,
+                   custom_water_goal=False):
     try:
-        execute_query('''INSERT INTO users 
-                         (user_id, username, weight, height, age, activity, city, water_goal, calorie_goal) 
-                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                      (user_id, username, weight, height, age, activity, city, water_goal, calorie_goal))
-    except sqlite3.IntegrityError:
+        await execute_query('''INSERT INTO users 
+                         (user_id, username, weight, height, age, activity, city, water_goal, calorie_goal,
+                          custom_water_goal) 
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                      (user_id, username, weight, height, age, activity, city, water_goal, calorie_goal,
+                       int(custom_water_goal)))
+    except pool.IntegrityError:
         raise ValueError(f"User with ID {user_id} already exists.")
+    finally:
+        _invalidate_profile(user_id)
+
+
+async def delete_user(user_id):
+    try:
+        await execute_query('DELETE FROM users WHERE user_id = ?', (user_id,))
+    finally:
+        _invalidate_profile(user_id)
+
+
+async def update_user(user_id, **kwargs):
+    if not kwargs:
+        return
+    unknown = set(kwargs) - set(USER_COLUMNS[1:])
+    if unknown:
+        raise ValueError(f"Unknown user fields: {', '.join(sorted(unknown))}")
+    assignments = ', '.join(f'{key} = ?' for key in kwargs)
+    try:
+        await execute_query(f'UPDATE users SET {assignments} WHERE user_id = ?', (*kwargs.values(), user_id))
+    finally:
+        _invalidate_profile(user_id)
+
+
+def insert_logs(conn, entries):
+    rows = defaultdict(list)
+    totals_rows = []
+    for table, user_id, totals, values in entries:
+        # Записи daily_totals из импорта — сумма логов, удаленных компакцией, сырых строк у них нет
+        if table != 'daily_totals':
+            rows[(table, tuple(values.keys()))].append((user_id, *values.values()))
+        totals_rows.append((user_id, values["day"],
+                            totals.get("water_ml", 0),
+                            totals.get("extra_water", 0),
+                            totals.get("calories_consumed", 0),
+                            totals.get("calories_burned", 0)))
+    try:
+        for (table, keys), params in rows.items():
+            columns = ', '.join(keys)
+            placeholders = ', '.join(['?'] * len(keys))
+            conn.executemany(f'INSERT INTO {table} (user_id, {columns}) VALUES (?, {placeholders})', params)
+        conn.executemany('''INSERT INTO daily_totals
+                                (user_id, day, water_ml, extra_water, calories_consumed, calories_burned)
+                            VALUES (?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(user_id, day) DO UPDATE SET
+                                water_ml = daily_totals.water_ml + excluded.water_ml,
+                                extra_water = daily_totals.extra_water + excluded.extra_water,
+                                calories_consumed = daily_totals.calories_consumed + excluded.calories_consumed,
+                                calories_burned = daily_totals.calories_burned + excluded.calories_burned''',
+                         totals_rows)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Database error: {e}")
+        raise
 
 
-def delete_user(user_id):
-    execute_query('DELETE FROM users WHERE user_id = ?', (user_id,))
+async def _flush_logs(entries):
+    with track_query("INSERT_BATCH"):
+        await pool.run(insert_logs, entries)
 
 
-def update_user(user_id, **kwargs):
-    for key, value in kwargs.items():
-        execute_query(f'UPDATE users SET {key} = ? WHERE user_id = ?', (value, user_id))
+log_writer = (
+    LogWriter(_flush_logs, LOG_FLUSH_INTERVAL_MS / 1000, LOG_FLUSH_MAX_ROWS, durable=LOG_WRITE_DURABLE)
+    if LOG_WRITE_BEHIND
+    else None
+)
 
 
-def create_log_tables():
-    log_tables = [
-        '''CREATE TABLE IF NOT EXISTS water_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            timestamp DATETIME,
-            amount_ml FLOAT,
-            FOREIGN KEY(user_id) REFERENCES users(user_id))''',
-        '''CREATE TABLE IF NOT EXISTS food_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            timestamp DATETIME,
-            food TEXT,
-            calories_per_100g FLOAT,
-            grams FLOAT,
-            FOREIGN KEY(user_id) REFERENCES users(user_id))''',
-        '''CREATE TABLE IF NOT EXISTS exercise_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            exercise_type TEXT,
-            timestamp DATETIME,
-            duration_minutes FLOAT,
-            calories_burned FLOAT,
-            FOREIGN KEY(user_id) REFERENCES users(user_id))'''
-    ]
-    for table_query in log_tables:
-        execute_query(table_query)
+def start_log_writer():
+    if log_writer is not None:
+        log_writer.start()
 
 
-def log_entry(table, user_id, **kwargs):
-    columns = ', '.join(kwargs.keys())
-    placeholders = ', '.join(['?'] * len(kwargs))
-    query = f'INSERT INTO {table} (user_id, {columns}) VALUES (?, {placeholders})'
-    execute_query(query, (user_id, *kwargs.values()))
+async def stop_log_writer():
+    if log_writer is not None:
+        await log_writer.stop()
 
 
-def log_water(user_id, amount_ml):
-    log_entry('water_logs', user_id, timestamp=datetime.now(), amount_ml=amount_ml)
+async def flush_log_writer():
+    if log_writer is not None:
+        await log_writer.flush()
 
 
-def log_food(user_id, food, calories_per_100g, grams):
-    log_entry('food_logs', user_id, timestamp=datetime.now(), food=food, calories_per_100g=calories_per_100g, grams=grams)
+def entry_totals(table, values):
+    if table == 'water_logs':
+        amount_ml = float(values["amount_ml"])
+        return {"water_ml": amount_ml} if amount_ml > 0 else {"extra_water": amount_ml}
+    if table == 'food_logs':
+        return {"calories_consumed": (float(values["calories_per_100g"]) * float(values["grams"])) / 100}
+    return {"calories_burned": float(values["calories_burned"])}
 
 
-def log_exercise(user_id, exercise_type, duration_minutes, calories_burned):
-    log_entry('exercise_logs', user_id, timestamp=datetime.now(), exercise_type=exercise_type, duration_minutes=duration_minutes, calories_burned=calories_burned)
+async def log_entry(table, user_id, **kwargs):
+    kwargs["day"] = kwargs["timestamp"].date().isoformat()
+    totals = entry_totals(table, kwargs)
+    entry = (table, user_id, totals, kwargs)
+    if log_writer is not None:
+        await log_writer.submit(entry, (user_id, kwargs["day"]), totals)
+    else:
+        await _flush_logs([entry])
 
 
-def get_daily_summary(user_id):
-    today = date.today().isoformat()
+async def log_water(user_id, amount_ml):
+    await log_entry('water_logs', user_id, timestamp=datetime.now(), amount_ml=float(amount_ml))
+
 
-    summary_queries = {
-        "water_goal": "SELECT water_goal FROM users WHERE user_id = ?",
-        "calorie_goal": "SELECT calorie_goal FROM users WHERE user_id = ?",
-        "total_water_ml": '''SELECT SUM(amount_ml) FROM water_logs 
-                             WHERE user_id = ? AND DATE(timestamp) = ? AND amount_ml > 0''',
-        "extra_water": '''SELECT SUM(amount_ml) FROM water_logs 
-                          WHERE user_id = ? AND DATE(timestamp) = ? AND amount_ml < 0''',
-        "total_calories_consumed": '''SELECT SUM((calories_per_100g * grams) / 100) 
-                                      FROM food_logs WHERE user_id = ? AND DATE(timestamp) = ?''',
-        "total_calories_burned": '''SELECT SUM(calories_burned) FROM exercise_logs 
-                                    WHERE user_id = ? AND DATE(timestamp) = ?'''
-    }
-
-    summary = {}
-    for key, query in summary_queries.items():
-        params = (user_id, today) if "DATE" in query else (user_id,)
-        summary[key] = execute_query(query, params, fetchone=True)[0] or 0
+async def log_food(user_id, food, calories_per_100g, grams):
+    await log_entry('food_logs', user_id, timestamp=datetime.now(), food=food, calories_per_100g=calories_per_100g, grams=grams)
 
+
+async def log_exercise(user_id, exercise_type, duration_minutes, calories_burned):
+    await log_entry('exercise_logs', user_id, timestamp=datetime.now(), exercise_type=exercise_type, duration_minutes=duration_minutes, calories_burned=calories_burned)
+
+
+async def _read_daily_totals(user_id, day):
+    return await execute_query(DAILY_TOTALS_QUERY, (user_id, day), fetchone=True)
+
+
+async def get_daily_summary(user_id):
+    today = date.today().isoformat()
+    user = await get_user_by_id(user_id) or {}
+    if log_writer is not None:
+        # Учитываем записи, которые еще не сброшены на диск
+        row, pending = await log_writer.read(lambda: _read_daily_totals(user_id, today), (user_id, today))
+    else:
+        row, pending = await _read_daily_totals(user_id, today), {}
+    row = row or (0,) * len(SUMMARY_TOTALS)
+    summary = {"water_goal": user.get("water_goal") or 0, "calorie_goal": user.get("calorie_goal") or 0}
+    for value, (key, column) in zip(row, SUMMARY_TOTALS.items()):
+        summary[key] = (value or 0) + pending.get(column, 0)
     return summary
+
+
+async def _read_totals_range(user_id, first_day, last_day):
+    return await execute_query(TOTALS_RANGE_QUERY, (user_id, first_day, last_day), fetchall=True)
+
+
+async def get_history(user_id, days):
+    last_day = date.today()
+    first_day = last_day - timedelta(days=days - 1)
+    today = last_day.isoformat()
+
+    async def read():
+        return await _read_totals_range(user_id, first_day.isoformat(), today)
+
+    if log_writer is not None:
+        rows, pending = await log_writer.read(read, (user_id, today))
+    else:
+        rows, pending = await read(), {}
+
+    history = {}
+    for row in rows:
+        history[row[0]] = {key: value or 0 for key, value in zip(SUMMARY_TOTALS, row[1:])}
+    if pending:
+        totals = history.setdefault(today, dict.fromkeys(SUMMARY_TOTALS, 0))
+        for key, column in SUMMARY_TOTALS.items():
+            totals[key] += pending.get(column, 0)
+    return first_day, history
+
+
+async def get_cached_food(name):
+    row = await execute_query('SELECT found, product_name, calories, expires_at FROM food_cache WHERE name = ?',
+                              (name,), fetchone=True)
+    if row is None or row[3] <= time.time():
+        return None
+    found, product_name, calories, expires_at = row
+    food_info = {"name": product_name, "calories": calories} if found else None
+    return food_info, expires_at
+
+
+async def save_cached_food(name, food_info, ttl):
+    if food_info:
+        values = (name, 1, food_info["name"], food_info["calories"], time.time() + ttl)
+    else:
+        values = (name, 0, None, None, time.time() + ttl)
+    await execute_query('''INSERT INTO food_cache (name, found, product_name, calories, expires_at)
+                           VALUES (?, ?, ?, ?, ?)
+                           ON CONFLICT(name) DO UPDATE SET
+                               found = excluded.found,
+                               product_name = excluded.product_name,
+                               calories = excluded.calories,
+                               expires_at = excluded.expires_at''', values)
+
+
+async def search_local_food(name):
+    if not is_sqlite():
+        return await _search_local_food_like(name)
+    terms = ['"{}"*'.format(term.replace('"', '""')) for term in name.split()]
+    if not terms:
+        return None
+    row = await execute_query('''SELECT product_name, calories FROM food_products
+                                 WHERE food_products MATCH ?
+                                 ORDER BY rank, length(product_name)
+                                 LIMIT 1''',
+                              (' '.join(terms),), fetchone=True)
+    if row is None:
+        return None
+    return {"name": row[0], "calories": row[1]}
+
+
+async def _search_local_food_like(name):
+    # Без FTS5 ищем продукт, в названии которого есть все слова запроса
+    terms = [f"%{term.lower()}%" for term in name.split()]
+    if not terms:
+        return None
+    conditions = ' AND '.join(['LOWER(product_name) LIKE ?'] * len(terms))
+    row = await execute_query(f'''SELECT product_name, calories FROM food_products
+                                  WHERE {conditions}
+                                  ORDER BY LENGTH(product_name)
+                                  LIMIT 1''',
+                              tuple(terms), fetchone=True)
+    if row is None:
+        return None
+    return {"name": row[0], "calories": row[1]}
+
+
+async def get_reminder(user_id):
+    row = await execute_query('SELECT due_at FROM reminders WHERE user_id = ?', (user_id,), fetchone=True)
+    return row[0] if row else None
+
+
+async def save_reminder(user_id, due_at):
+    await execute_query('INSERT INTO reminders (user_id, due_at) VALUES (?, ?) '
+                        'ON CONFLICT(user_id) DO UPDATE SET due_at = excluded.due_at', (user_id, due_at))
+
+
+def _delete_reminders(conn, user_ids):
+    try:
+        conn.executemany('DELETE FROM reminders WHERE user_id = ?', [(user_id,) for user_id in user_ids])
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Database error: {e}")
+        raise
+
+
+async def delete_reminders(user_ids):
+    await pool.run(_delete_reminders, user_ids)
+
+
+async def claim_reminders(now, next_due_at, limit):
+    # Наступившие напоминания сразу переносятся на next_due_at, и другой процесс их уже не заберет.
+    # В PostgreSQL строки, которые забирает другой процесс, пропускаются, а не ждут его коммита
+    skip_locked = ' FOR UPDATE SKIP LOCKED' if is_shared() else ''
+    rows = await execute_query(f'''UPDATE reminders SET due_at = ?
+                                   WHERE user_id IN (SELECT user_id FROM reminders
+                                                     WHERE due_at <= ?
+                                                     ORDER BY due_at
+                                                     LIMIT ?{skip_locked})
+                                   RETURNING user_id''',
+                               (next_due_at, now, limit), fetchall=True)
+    return [row[0] for row in rows]
+
+
+async def next_reminder_due():
+    row = await execute_query('SELECT MIN(due_at) FROM reminders', fetchone=True)
+    return row[0] if row else None
+
+
+async def get_water_progress(user_ids, day, chunk_size=500):
+    progress = {}
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        placeholders = ', '.join(['?'] * len(chunk))
+        rows = await execute_query(f'''SELECT u.user_id, u.water_goal, t.water_ml, t.extra_water
+                                       FROM users u
+                                       LEFT JOIN daily_totals t ON t.user_id = u.user_id AND t.day = ?
+                                       WHERE u.user_id IN ({placeholders})''',
+                                   (day, *chunk), fetchall=True)
+        for user_id, water_goal, water_ml, extra_water in rows:
+            pending = log_writer.pending_totals((user_id, day)) if log_writer is not None else {}
+            water_ml = (water_ml or 0) + pending.get("water_ml", 0)
+            extra_water = (extra_water or 0) + pending.get("extra_water", 0)
+            progress[user_id] = (water_goal or 0) - water_ml - extra_water
+    return progress
@@ -0,0 +1,114 @@
+import functools
+import re
+import zlib
+from contextlib import asynccontextmanager
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool
+from bot.utils.logging import logger
+
+# Плейсхолдер ? вне строковых литералов
+_PLACEHOLDER = re.compile(r"'(?:[^']|'')*'|\?")
+
+
+@functools.lru_cache(maxsize=512)
+def _compile(query):
+    # Запросы написаны в стиле sqlite3 (?), SQLAlchemy ждет именованные параметры.
+    # Один и тот же text() для одного запроса позволяет драйверу переиспользовать prepared statement
+    counter = iter(range(query.count("?")))
+
+    def replace(match):
+        return match.group() if match.group() != "?" else f":p{next(counter)}"
+
+    return text(_PLACEHOLDER.sub(replace, query))
+
+
+def _bind(params):
+    return {f"p{index}": value for index, value in enumerate(params)}
+
+
+class _Connection:
+    # Подмножество интерфейса sqlite3.Connection, которым пользуются функции для pool.run
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, query, params=()):
+        return self._conn.execute(_compile(query), _bind(params))
+
+    def stream(self, query, params=(), batch_size=1000):
+        # По умолчанию результат буферизуется целиком (asyncpg вычитывает все строки сразу),
+        # здесь строки идут через серверный курсор порциями по batch_size
+        return self._conn.execute(_compile(query), _bind(params), execution_options={"yield_per": batch_size})
+
+    def executemany(self, query, seq_of_params):
+        params = [_bind(row) for row in seq_of_params]
+        if params:
+            self._conn.execute(_compile(query), params)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+
+class SQLAlchemyPool:
+    IntegrityError = exc.IntegrityError
+
+    def __init__(self, url, size):
+        options = {"pool_recycle": 3600}
+        url = make_url(url)
+        # Размер задается только очереди соединений: у sqlite+aiosqlite:///:memory: один StaticPool
+        if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+            options.update(pool_size=size, max_overflow=0)
+        self._engine = create_async_engine(url, **options)
+        self.dialect = self._engine.dialect.name
+        if self.dialect == "sqlite":
+            event.listen(self._engine.sync_engine, "connect", _configure_sqlite)
+        logger.debug(f"Using SQLAlchemy {self.dialect} backend")
+
+    async def run(self, func, *args, **kwargs):
+        async with self._engine.connect() as conn:
+            return await conn.run_sync(lambda sync_conn: func(_Connection(sync_conn), *args, **kwargs))
+
+    # Серверная СУБД сама разводит читателей и писателей
+    read = run
+
+    async def create_schema(self):
+        from bot.db.schema import metadata
+
+        async with self._engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+
+    @asynccontextmanager
+    async def job_lock(self, name):
+        # Ночную задачу выполняет один из процессов, которые делят базу, остальные пропускают запуск
+        if self.dialect != "postgresql":
+            yield True
+            return
+        key = zlib.crc32(name.encode())
+        async with self._engine.connect() as conn:
+            locked = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key})).scalar()
+            # Сессионная блокировка переживает commit, а открытая транзакция не висит все время задачи
+            await conn.commit()
+            try:
+                yield locked
+            finally:
+                if locked:
+                    await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                    await conn.commit()
+
+    async def aclose(self):
+        await self._engine.dispose()
+
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA page_count")
+    if cursor.fetchone()[0] == 0:
+        # Режим auto_vacuum выбирается только для нового файла, до перехода в WAL
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.close()
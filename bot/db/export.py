@@ -0,0 +1,196 @@
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import sys
+from datetime import datetime
+from bot.db.crud import LOG_COLUMNS, pool, entry_totals, insert_logs
+from bot.db.crud import create_db, close_db
+from bot.db.migrations import LOG_TABLES
+from bot.utils.logging import logger
+
+DEFAULT_BATCH_SIZE = 5000
+TOTALS_COLUMNS = ("water_ml", "extra_water", "calories_consumed", "calories_burned")
+TOTALS_EPSILON = 1e-6
+NUMERIC_COLUMNS = {"amount_ml", "calories_per_100g", "grams", "duration_minutes", "calories_burned"}
+CSV_FIELDS = ["table", "user_id"] + list(dict.fromkeys(
+    [column for table in LOG_TABLES for column in LOG_COLUMNS[table]] + list(TOTALS_COLUMNS)
+))
+
+
+def _iter_rows(conn, query, params, batch_size):
+    # Читаем порциями, чтобы не держать всю таблицу в памяти. sqlite3 и так отдает строки
+    # по мере чтения, соединению SQLAlchemy нужен серверный курсор
+    stream = getattr(conn, "stream", None)
+    cursor = stream(query, params, batch_size) if stream else conn.execute(query, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def iter_log_rows(conn, user_id=None, tables=LOG_TABLES, batch_size=DEFAULT_BATCH_SIZE):
+    for table in tables:
+        columns = LOG_COLUMNS[table]
+        query = f'SELECT user_id, {", ".join(columns)} FROM {table}'
+        params = ()
+        if user_id is not None:
+            query += ' WHERE user_id = ?'
+            params = (user_id,)
+        for row in _iter_rows(conn, query + ' ORDER BY id', params, batch_size):
+            yield {"table": table, "user_id": row[0], **dict(zip(columns, row[1:]))}
+
+
+def iter_compacted_totals(conn, user_id=None, batch_size=DEFAULT_BATCH_SIZE):
+    # Компакция удаляет сырые логи, оставляя их сумму в daily_totals. Выгружаем ту часть
+    # daily_totals, которую оставшиеся логи не покрывают, — при импорте она прибавляется к сумме логов
+    condition, outer_condition, params = '', '', ()
+    if user_id is not None:
+        condition, outer_condition, params = 'WHERE user_id = ?', 'WHERE t.user_id = ?', (user_id,) * 4
+    query = f'''SELECT t.user_id, t.day,
+                      t.water_ml - COALESCE(r.water_ml, 0),
+                      t.extra_water - COALESCE(r.extra_water, 0),
+                      t.calories_consumed - COALESCE(r.calories_consumed, 0),
+                      t.calories_burned - COALESCE(r.calories_burned, 0)
+               FROM daily_totals t
+               LEFT JOIN (
+                   SELECT user_id, day, SUM(water_ml) AS water_ml, SUM(extra_water) AS extra_water,
+                          SUM(calories_consumed) AS calories_consumed, SUM(calories_burned) AS calories_burned
+                   FROM (
+                       SELECT user_id, day,
+                              CASE WHEN amount_ml > 0 THEN amount_ml ELSE 0 END AS water_ml,
+                              CASE WHEN amount_ml < 0 THEN amount_ml ELSE 0 END AS extra_water,
+                              0 AS calories_consumed, 0 AS calories_burned
+                       FROM water_logs {condition}
+                       UNION ALL
+                       SELECT user_id, day, 0, 0, (calories_per_100g * grams) / 100, 0
+                       FROM food_logs {condition}
+                       UNION ALL
+                       SELECT user_id, day, 0, 0, 0, calories_burned
+                       FROM exercise_logs {condition}
+                   ) logs
+                   GROUP BY user_id, day
+               ) r ON r.user_id = t.user_id AND r.day = t.day
+               {outer_condition}
+               ORDER BY t.user_id, t.day'''
+    for row in _iter_rows(conn, query, params, batch_size):
+        totals = dict(zip(TOTALS_COLUMNS, row[2:]))
+        # Для дней с целыми логами остаток — только погрешность округления
+        if any(abs(value or 0) > TOTALS_EPSILON for value in totals.values()):
+            yield {"table": "daily_totals", "user_id": row[0], "day": row[1], **totals}
+
+
+def write_rows(rows, stream, fmt):
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            stream.write(json.dumps(row, ensure_ascii=False, default=str))
+            stream.write("\n")
+            count += 1
+    return count
+
+
+def export_logs(conn, stream, fmt, user_id=None, batch_size=DEFAULT_BATCH_SIZE):
+    rows = itertools.chain(
+        iter_log_rows(conn, user_id, batch_size=batch_size),
+        iter_compacted_totals(conn, user_id, batch_size),
+    )
+    count = write_rows(rows, stream, fmt)
+    logger.info(f"Exported {count} log rows")
+    return count
+
+
+def read_rows(stream, fmt):
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def parse_entry(row):
+    table = row["table"]
+    if table == "daily_totals":
+        totals = {column: float(row.get(column) or 0) for column in TOTALS_COLUMNS}
+        return table, int(row["user_id"]), totals, {"day": row["day"]}
+    if table not in LOG_COLUMNS:
+        raise ValueError(f"Unknown log table: {table}")
+    values = {}
+    for column in LOG_COLUMNS[table]:
+        value = row.get(column)
+        if value in ("", None):
+            value = None
+        elif column in NUMERIC_COLUMNS:
+            value = float(value)
+        values[column] = value
+    if values["timestamp"] is not None:
+        values["timestamp"] = datetime.fromisoformat(str(values["timestamp"]))
+    if values["day"] is None:
+        values["day"] = values["timestamp"].date().isoformat()
+    return table, int(row["user_id"]), entry_totals(table, values), values
+
+
+def import_logs(conn, stream, fmt, batch_size=DEFAULT_BATCH_SIZE):
+    imported = 0
+    batch = []
+    for row in read_rows(stream, fmt):
+        batch.append(parse_entry(row))
+        if len(batch) >= batch_size:
+            insert_logs(conn, batch)
+            imported += len(batch)
+            batch.clear()
+    if batch:
+        insert_logs(conn, batch)
+        imported += len(batch)
+    logger.info(f"Imported {imported} log rows")
+    return imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import water, food and exercise logs.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument("--user-id", type=int, help="export a single user, all users by default")
+    export_parser.add_argument("--output", help="file to write, stdout by default")
+
+    import_parser = subparsers.add_parser("import")
+    import_parser.add_argument("path")
+
+    for subparser in (export_parser, import_parser):
+        subparser.add_argument("--format", choices=("csv", "jsonl"), default="jsonl")
+        subparser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    async def run():
+        try:
+            if args.command == "export":
+                if args.output:
+                    with open(args.output, "w", encoding="utf-8", newline="") as stream:
+                        await pool.read(export_logs, stream, args.format, args.user_id, args.batch_size)
+                else:
+                    await pool.read(export_logs, sys.stdout, args.format, args.user_id, args.batch_size)
+            else:
+                await create_db()
+                with open(args.path, "r", encoding="utf-8", newline="") as stream:
+                    await pool.run(import_logs, stream, args.format, args.batch_size)
+        finally:
+            await close_db()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import csv
+import gzip
+import json
+import sys
+from bot.db.crud import pool, create_db, close_db, is_sqlite
+from bot.utils.logging import logger
+
+DEFAULT_BATCH_SIZE = 5000
+CALORIES_FIELD = "energy-kcal_100g"
+
+
+def open_dump(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def read_csv(stream):
+    # Выгрузка OpenFoodFacts в CSV разделена табуляцией и содержит очень длинные поля
+    csv.field_size_limit(2**31 - 1)
+    for row in csv.DictReader(stream, delimiter="\t"):
+        yield row.get("product_name"), row.get(CALORIES_FIELD)
+
+
+def read_jsonl(stream):
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            product = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        yield product.get("product_name"), (product.get("nutriments") or {}).get(CALORIES_FIELD)
+
+
+def iter_products(path, fmt):
+    reader = read_jsonl if fmt == "jsonl" else read_csv
+    with open_dump(path) as stream:
+        for name, calories in reader(stream):
+            name = (name or "").strip()
+            try:
+                calories = float(calories)
+            except (TypeError, ValueError):
+                continue
+            if name and calories >= 0:
+                yield name, calories
+
+
+def import_products(conn, path, fmt, batch_size=DEFAULT_BATCH_SIZE, replace=False, optimize=True):
+    imported = 0
+    if replace:
+        conn.execute("DELETE FROM food_products")
+    batch = []
+    for product in iter_products(path, fmt):
+        batch.append(product)
+        if len(batch) >= batch_size:
+            conn.executemany("INSERT INTO food_products (product_name, calories) VALUES (?, ?)", batch)
+            conn.commit()
+            imported += len(batch)
+            batch.clear()
+            logger.info(f"Imported {imported} products")
+    if batch:
+        conn.executemany("INSERT INTO food_products (product_name, calories) VALUES (?, ?)", batch)
+        imported += len(batch)
+    conn.commit()
+    if optimize:
+        # Слияние сегментов FTS5 после массовой вставки
+        conn.execute("INSERT INTO food_products (food_products) VALUES ('optimize')")
+        conn.commit()
+    logger.info(f"Food index import finished: {imported} products")
+    return imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import an OpenFoodFacts dump into the local food index.")
+    parser.add_argument("path", help="CSV or JSONL export, optionally gzip-compressed")
+    parser.add_argument("--format", choices=("csv", "jsonl"))
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--replace", action="store_true", help="drop previously imported products")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("jsonl" if ".json" in args.path else "csv")
+
+    async def run():
+        try:
+            await create_db()
+            return await pool.run(import_products, args.path, fmt, args.batch_size, args.replace, is_sqlite())
+        finally:
+            await close_db()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
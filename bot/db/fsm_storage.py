@@ -0,0 +1,174 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from bot.utils.logging import logger
+
+
+class _Entry:
+    __slots__ = ("state", "data", "touched_at")
+
+    def __init__(self, state=None, data=None):
+        self.state = state
+        self.data = data or {}
+        self.touched_at = time.time()
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(self, pool, ttl, flush_interval, max_cached):
+        self._pool = pool
+        self._ttl = ttl
+        self._flush_interval = flush_interval
+        self._max_cached = max_cached
+        self._cache = OrderedDict()
+        self._dirty = set()
+        self._task = None
+        self._stopping = asyncio.Event()
+        self._last_purge = 0.0
+
+    @staticmethod
+    def _make_key(key: StorageKey) -> str:
+        parts = (
+            key.bot_id,
+            key.chat_id,
+            key.user_id,
+            key.thread_id,
+            getattr(key, "business_connection_id", None),
+            key.destiny,
+        )
+        return ":".join("" if part is None else str(part) for part in parts)
+
+    async def start(self):
+        # Таблица fsm_states создается миграциями
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    def _shared(self):
+        # Серверную базу делят несколько процессов бота: состояние читается из базы и пишется сразу
+        return self._pool.dialect != "sqlite"
+
+    async def _load(self, key: StorageKey) -> _Entry:
+        db_key = self._make_key(key)
+        shared = self._shared()
+        entry = None if shared else self._cache.get(db_key)
+        if entry is None:
+            row = await self._pool.read(_select_state, db_key, time.time() - self._ttl)
+            loaded = _Entry(row[0], json.loads(row[1])) if row else _Entry()
+            if shared:
+                entry = self._cache[db_key] = loaded
+            else:
+                # Пока шло чтение, запись могла появиться в кеше
+                entry = self._cache.setdefault(db_key, loaded)
+        entry.touched_at = time.time()
+        self._cache.move_to_end(db_key)
+        return entry
+
+    async def set_state(self, key: StorageKey, state=None) -> None:
+        entry = await self._load(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._dirty.add(self._make_key(key))
+        if self._shared():
+            await self.flush()
+
+    async def get_state(self, key: StorageKey):
+        return (await self._load(key)).state
+
+    async def set_data(self, key: StorageKey, data) -> None:
+        entry = await self._load(key)
+        entry.data = dict(data)
+        self._dirty.add(self._make_key(key))
+        if self._shared():
+            await self.flush()
+
+    async def get_data(self, key: StorageKey):
+        return dict((await self._load(key)).data)
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        rows, deleted = [], []
+        for db_key in dirty:
+            entry = self._cache.get(db_key)
+            if entry is None or (entry.state is None and not entry.data):
+                deleted.append((db_key,))
+            else:
+                rows.append((db_key, entry.state, json.dumps(entry.data), entry.touched_at))
+        try:
+            await self._pool.run(_save_states, rows, deleted)
+        except Exception as e:
+            logger.error(f"Cannot persist {len(dirty)} FSM states: {e}")
+            self._dirty |= dirty
+
+    def _evict(self):
+        expires_at = time.time() - self._ttl
+        while self._cache:
+            db_key, entry = next(iter(self._cache.items()))
+            idle = entry.touched_at < expires_at
+            if not idle and len(self._cache) <= self._max_cached:
+                break
+            if db_key in self._dirty and not idle:
+                # Несохраненные записи вытесняем только после flush
+                break
+            self._cache.popitem(last=False)
+            if idle:
+                self._dirty.discard(db_key)
+
+    async def _purge(self):
+        now = time.time()
+        if now - self._last_purge < self._ttl / 10:
+            return
+        self._last_purge = now
+        deleted = await self._pool.run(_delete_expired, now - self._ttl)
+        if deleted:
+            logger.info(f"Evicted {deleted} idle FSM states")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self._flush_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+                self._evict()
+                await self._purge()
+            except Exception as e:
+                logger.error(f"FSM storage maintenance failed: {e}")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            # Отмена посреди flush потеряла бы уже снятый набор _dirty, поэтому ждем конца обслуживания
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+def _select_state(conn, key, expires_at):
+    return conn.execute('SELECT state, data FROM fsm_states WHERE key = ? AND updated_at >= ?',
+                        (key, expires_at)).fetchone()
+
+
+def _save_states(conn, rows, deleted):
+    try:
+        conn.executemany('''INSERT INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                            ON CONFLICT(key) DO UPDATE SET
+                                state = excluded.state,
+                                data = excluded.data,
+                                updated_at = excluded.updated_at''', rows)
+        conn.executemany('DELETE FROM fsm_states WHERE key = ?', deleted)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _delete_expired(conn, expires_at):
+    deleted = conn.execute('DELETE FROM fsm_states WHERE updated_at < ?', (expires_at,)).rowcount
+    conn.commit()
+    return deleted
@@ -0,0 +1,221 @@
+import asyncio
+import time
+from bot.utils.logging import logger
+
+LOG_TABLES = ('water_logs', 'food_logs', 'exercise_logs')
+
+
+def _users(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS users (
+                        user_id INTEGER PRIMARY KEY,
+                        username TEXT,
+                        weight INTEGER,
+                        height INTEGER,
+                        age INTEGER,
+                        activity INTEGER,
+                        city TEXT,
+                        water_goal INTEGER,
+                        calorie_goal INTEGER,
+                        custom_water_goal INTEGER DEFAULT 0)''')
+    # Базы, созданные до появления custom_water_goal
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(users)')]
+    if 'custom_water_goal' not in columns:
+        logger.info("Adding custom_water_goal column to users")
+        conn.execute('ALTER TABLE users ADD COLUMN custom_water_goal INTEGER DEFAULT 0')
+        _mark_custom_water_goals(conn)
+
+
+def _mark_custom_water_goals(conn):
+    # Раньше своя цель по воде никак не отмечалась. Цель, совпадающая с формулой (с надбавкой
+    # за жару или без), рассчитана ботом, остальные задал пользователь — их пересчет не трогает
+    from bot.utils.calculation import EXTRA_WATER_HOT_WEATHER, water_goal_for_temperature
+
+    custom = []
+    for user_id, weight, activity, water_goal in conn.execute(
+            'SELECT user_id, weight, activity, water_goal FROM users WHERE water_goal IS NOT NULL'):
+        calculated = water_goal_for_temperature(weight or 0, activity or 0)
+        if all(abs(water_goal - goal) >= 1 for goal in (calculated, calculated + EXTRA_WATER_HOT_WEATHER)):
+            custom.append((user_id,))
+    conn.executemany('UPDATE users SET custom_water_goal = 1 WHERE user_id = ?', custom)
+    logger.info(f"Marked {len(custom)} existing water goals as custom")
+
+
+def _log_tables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS water_logs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER,
+                        timestamp DATETIME,
+                        day TEXT,
+                        amount_ml FLOAT,
+                        FOREIGN KEY(user_id) REFERENCES users(user_id))''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS food_logs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER,
+                        timestamp DATETIME,
+                        day TEXT,
+                        food TEXT,
+                        calories_per_100g FLOAT,
+                        grams FLOAT,
+                        FOREIGN KEY(user_id) REFERENCES users(user_id))''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS exercise_logs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER,
+                        exercise_type TEXT,
+                        timestamp DATETIME,
+                        day TEXT,
+                        duration_minutes FLOAT,
+                        calories_burned FLOAT,
+                        FOREIGN KEY(user_id) REFERENCES users(user_id))''')
+    # Базы, созданные до появления колонки day
+    for table in LOG_TABLES:
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+        if 'day' not in columns:
+            logger.info(f"Adding day column to {table}")
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN day TEXT')
+            conn.execute(f'UPDATE {table} SET day = DATE(timestamp)')
+
+
+def _daily_totals(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_totals'"
+    ).fetchone()
+    if exists:
+        return
+    conn.execute('''CREATE TABLE daily_totals (
+                        user_id INTEGER,
+                        day TEXT,
+                        water_ml FLOAT DEFAULT 0,
+                        extra_water FLOAT DEFAULT 0,
+                        calories_consumed FLOAT DEFAULT 0,
+                        calories_burned FLOAT DEFAULT 0,
+                        PRIMARY KEY (user_id, day),
+                        FOREIGN KEY(user_id) REFERENCES users(user_id))''')
+    # Заполняем агрегаты по уже существующим логам
+    conn.execute('''INSERT INTO daily_totals
+                        (user_id, day, water_ml, extra_water, calories_consumed, calories_burned)
+                    SELECT user_id, day, SUM(water_ml), SUM(extra_water),
+                           SUM(calories_consumed), SUM(calories_burned)
+                    FROM (
+                        SELECT user_id, day,
+                               CASE WHEN amount_ml > 0 THEN amount_ml ELSE 0 END AS water_ml,
+                               CASE WHEN amount_ml < 0 THEN amount_ml ELSE 0 END AS extra_water,
+                               0 AS calories_consumed, 0 AS calories_burned
+                        FROM water_logs
+                        UNION ALL
+                        SELECT user_id, day, 0, 0, (calories_per_100g * grams) / 100, 0
+                        FROM food_logs
+                        UNION ALL
+                        SELECT user_id, day, 0, 0, 0, calories_burned
+                        FROM exercise_logs
+                    )
+                    GROUP BY user_id, day''')
+
+
+def _food_cache(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS food_cache (
+                        name TEXT PRIMARY KEY,
+                        found INTEGER,
+                        product_name TEXT,
+                        calories FLOAT,
+                        expires_at FLOAT)''')
+
+
+def _food_index(conn):
+    conn.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS food_products USING fts5(
+                        product_name,
+                        calories UNINDEXED,
+                        tokenize = 'unicode61 remove_diacritics 2')''')
+
+
+def _reminders(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS reminders (
+                        user_id INTEGER PRIMARY KEY,
+                        due_at INTEGER)''')
+
+
+def _reminders_due_index(conn):
+    # Процессы забирают наступившие напоминания диапазоном по due_at
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_reminders_due_at ON reminders (due_at)')
+
+
+def _fsm_states(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS fsm_states (
+                        key TEXT PRIMARY KEY,
+                        state TEXT,
+                        data TEXT,
+                        updated_at FLOAT)''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_fsm_states_updated_at ON fsm_states (updated_at)')
+
+
+def _log_indexes(conn):
+    # На больших логах это самая долгая миграция; сводки читают daily_totals и без этих индексов
+    for table in LOG_TABLES:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_user_day ON {table} (user_id, day)')
+
+
+# (версия, название, функция, выполнять в фоне). Новые миграции добавляются только в конец
+MIGRATIONS = [
+    (1, "users", _users, False),
+    (2, "log tables", _log_tables, False),
+    (3, "daily totals", _daily_totals, False),
+    (4, "food cache", _food_cache, False),
+    (5, "food index", _food_index, False),
+    (6, "reminders", _reminders, False),
+    (7, "fsm states", _fsm_states, False),
+    (8, "log indexes", _log_indexes, True),
+    (9, "reminders due index", _reminders_due_index, False),
+]
+
+
+def _applied_versions(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'"
+    ).fetchone()
+    if not exists:
+        conn.execute('''CREATE TABLE schema_migrations (
+                            version INTEGER PRIMARY KEY,
+                            name TEXT,
+                            applied_at FLOAT)''')
+        conn.commit()
+        return set()
+    return {row[0] for row in conn.execute('SELECT version FROM schema_migrations')}
+
+
+def _apply(conn, version, name, func):
+    started = time.perf_counter()
+    try:
+        func(conn)
+        conn.execute('INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)',
+                     (version, name, time.time()))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Migration {version} ({name}) failed: {e}")
+        raise
+    logger.info(f"Applied migration {version} ({name}) in {time.perf_counter() - started:.3f}s")
+
+
+async def _apply_all(pool, migrations):
+    for version, name, func, _ in migrations:
+        await pool.run(_apply, version, name, func)
+
+
+async def migrate(pool, background=False):
+    # С background=True долгие миграции запускаются отдельной задачей, она и возвращается
+    if pool.dialect != "sqlite":
+        # Серверная СУБД: схема создается целиком из bot/db/schema.py
+        await pool.create_schema()
+        return None
+
+    applied = await pool.run(_applied_versions)
+    if len(applied) == len(MIGRATIONS):
+        return None
+    pending = [migration for migration in MIGRATIONS if migration[0] not in applied]
+    await _apply_all(pool, [migration for migration in pending if not migration[3]])
+    deferred = [migration for migration in pending if migration[3]]
+    if not deferred:
+        return None
+    if background:
+        return asyncio.create_task(_apply_all(pool, deferred))
+    await _apply_all(pool, deferred)
+    return None
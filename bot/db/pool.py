@@ -0,0 +1,160 @@
+import asyncio
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from bot.utils.logging import logger
+
+# Настройки, которые хранятся в самом файле базы и меняются только через писателя
+_PERSISTENT_PRAGMAS = ("journal_mode", "auto_vacuum")
+# Применяются только к пустому файлу: у существующей базы режим меняет лишь полный VACUUM
+_NEW_DATABASE_PRAGMAS = ("auto_vacuum",)
+
+
+class ConnectionPool:
+    dialect = "sqlite"
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, database, size, pragmas=None):
+        self._database = database
+        self._size = size
+        self._pragmas = pragmas or {}
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        # Все записи идут через одно соединение в одном потоке: SQLite все равно допускает
+        # только одного писателя, а так запись не ждет busy_timeout и не ловит SQLITE_BUSY
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._writer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        # У базы в памяти каждое соединение видит свою копию, читаем через писателя
+        self._shared = database == ":memory:" or "mode=memory" in database
+
+    def _connect(self, readonly):
+        conn = sqlite3.connect(self._database, check_same_thread=False,
+                               uri=self._database.startswith("file:"))
+        empty = not readonly and conn.execute("PRAGMA page_count").fetchone()[0] == 0
+        for name, value in self._pragmas.items():
+            if readonly and name in _PERSISTENT_PRAGMAS:
+                continue
+            if name in _NEW_DATABASE_PRAGMAS and not empty:
+                continue
+            conn.execute(f"PRAGMA {name} = {value}").fetchall()
+        if readonly:
+            conn.execute("PRAGMA query_only = ON")
+        logger.debug(f"Opened {'reader' if readonly else 'writer'} database connection #{self._created}")
+        return conn
+
+    def _get_writer(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed.")
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._connect(readonly=False)
+            return self._writer
+
+    def acquire(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed.")
+        # Писатель создается первым, чтобы успеть перевести базу в WAL
+        self._get_writer()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self._size:
+                self._created += 1
+                return self._connect(readonly=True)
+        return self._idle.get()
+
+    def release(self, conn):
+        if self._closed:
+            conn.close()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+        self._writer_executor.shutdown(wait=True)
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    async def aclose(self):
+        self.close()
+
+    @asynccontextmanager
+    async def job_lock(self, name):
+        # С файлом SQLite работает один процесс бота: запись все равно идет через единственного писателя
+        yield True
+
+    async def run(self, func, *args, **kwargs):
+        # sqlite3 блокирует поток, поэтому запросы выполняются вне event loop
+        def call():
+            conn = self._get_writer()
+            try:
+                return func(conn, *args, **kwargs)
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+
+        return await asyncio.get_running_loop().run_in_executor(self._writer_executor, call)
+
+    async def read(self, func, *args, **kwargs):
+        # Только чтение: в WAL читатели не ждут писателя и друг друга
+        if self._shared:
+            return await self.run(func, *args, **kwargs)
+
+        def call():
+            with self.connection() as conn:
+                return func(conn, *args, **kwargs)
+
+        return await asyncio.to_thread(call)
+
+
+class LazyPool:
+    # Пул создается при первом запросе: модули с запросами импортируются и без настроенной базы
+    def __init__(self, factory):
+        self._factory = factory
+        self._pool = None
+
+    def __getattr__(self, name):
+        if self._pool is None:
+            self._pool = self._factory()
+        return getattr(self._pool, name)
+
+    async def aclose(self):
+        if self._pool is not None:
+            await self._pool.aclose()
+
+
+def create_pool(url, size, pragmas=None):
+    # Путь к файлу или sqlite:///path — встроенный sqlite3, остальные схемы — через SQLAlchemy
+    if "://" not in url:
+        return ConnectionPool(url, size, pragmas)
+    if url.startswith("sqlite:///"):
+        return ConnectionPool(url.removeprefix("sqlite:///"), size, pragmas)
+    from bot.db.engine import SQLAlchemyPool
+
+    return SQLAlchemyPool(url, size)
@@ -0,0 +1,97 @@
+from sqlalchemy import (
+    BigInteger, Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, PrimaryKeyConstraint, Table, Text,
+)
+
+# Схема для серверных СУБД; у SQLite свои CREATE TABLE и миграции в migrations.py
+metadata = MetaData()
+
+users = Table(
+    "users", metadata,
+    Column("user_id", BigInteger, primary_key=True, autoincrement=False),
+    Column("username", Text),
+    Column("weight", Integer),
+    Column("height", Integer),
+    Column("age", Integer),
+    Column("activity", Integer),
+    Column("city", Text),
+    Column("water_goal", Float),
+    Column("calorie_goal", Float),
+    Column("custom_water_goal", Integer, server_default="0"),
+)
+
+water_logs = Table(
+    "water_logs", metadata,
+    Column("id", BigInteger, primary_key=True),
+    Column("user_id", BigInteger, ForeignKey("users.user_id")),
+    Column("timestamp", DateTime),
+    Column("day", Text),
+    Column("amount_ml", Float),
+    Index("idx_water_logs_user_day", "user_id", "day"),
+)
+
+food_logs = Table(
+    "food_logs", metadata,
+    Column("id", BigInteger, primary_key=True),
+    Column("user_id", BigInteger, ForeignKey("users.user_id")),
+    Column("timestamp", DateTime),
+    Column("day", Text),
+    Column("food", Text),
+    Column("calories_per_100g", Float),
+    Column("grams", Float),
+    Index("idx_food_logs_user_day", "user_id", "day"),
+)
+
+exercise_logs = Table(
+    "exercise_logs", metadata,
+    Column("id", BigInteger, primary_key=True),
+    Column("user_id", BigInteger, ForeignKey("users.user_id")),
+    Column("exercise_type", Text),
+    Column("timestamp", DateTime),
+    Column("day", Text),
+    Column("duration_minutes", Float),
+    Column("calories_burned", Float),
+    Index("idx_exercise_logs_user_day", "user_id", "day"),
+)
+
+daily_totals = Table(
+    "daily_totals", metadata,
+    Column("user_id", BigInteger, ForeignKey("users.user_id")),
+    Column("day", Text),
+    Column("water_ml", Float, server_default="0"),
+    Column("extra_water", Float, server_default="0"),
+    Column("calories_consumed", Float, server_default="0"),
+    Column("calories_burned", Float, server_default="0"),
+    PrimaryKeyConstraint("user_id", "day"),
+)
+
+food_cache = Table(
+    "food_cache", metadata,
+    Column("name", Text, primary_key=True),
+    Column("found", Integer),
+    Column("product_name", Text),
+    Column("calories", Float),
+    Column("expires_at", Float),
+)
+
+# Без FTS5: поиск идет по LIKE, см. search_local_food
+food_products = Table(
+    "food_products", metadata,
+    Column("product_name", Text),
+    Column("calories", Float),
+)
+
+reminders = Table(
+    "reminders", metadata,
+    Column("user_id", BigInteger, primary_key=True, autoincrement=False),
+    Column("due_at", BigInteger),
+    Index("idx_reminders_due_at", "due_at"),
+)
+
+fsm_states = Table(
+    "fsm_states", metadata,
+    Column("key", Text, primary_key=True),
+    Column("state", Text),
+    Column("data", Text),
+    Column("updated_at", Float),
+    Index("idx_fsm_states_updated_at", "updated_at"),
+)
@@ -0,0 +1,110 @@
+import asyncio
+from collections import Counter, defaultdict
+from bot.utils.logging import logger
+
+
+class LogWriter:
+    def __init__(self, flush_func, flush_interval, max_rows, durable=False):
+        self._flush_func = flush_func
+        self._flush_interval = flush_interval
+        self._max_rows = max_rows
+        self._durable = durable
+        self._pending = []
+        self._waiters = []
+        self._pending_totals = defaultdict(Counter)
+        self._pending_counts = Counter()
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task = None
+        self._stopping = False
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            # Цикл завершается сам после текущего сброса: отмена посреди flush потеряла бы пакет
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def submit(self, entry, key, totals):
+        self._pending.append((entry, key, totals))
+        self._pending_totals[key].update(totals)
+        self._pending_counts[key] += 1
+        waiter = None
+        if self._durable:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+        if len(self._pending) >= self._max_rows:
+            self._wakeup.set()
+        if waiter is not None:
+            await waiter
+
+    def pending_totals(self, key):
+        return dict(self._pending_totals.get(key, {}))
+
+    async def read(self, func, key):
+        # Повторяем чтение, если во время него записался пакет: иначе строки посчитаются дважды
+        while True:
+            await self._idle.wait()
+            generation = self._generation
+            result = await func()
+            if self._idle.is_set() and generation == self._generation:
+                return result, self.pending_totals(key)
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            waiters, self._waiters = self._waiters, []
+            self._generation += 1
+            self._idle.clear()
+            try:
+                await self._flush_func([entry for entry, _, _ in batch])
+            except Exception as e:
+                logger.error(f"Cannot flush {len(batch)} log entries: {e}")
+                if self._durable:
+                    # Вызывающий код получит ошибку, поэтому пакет не повторяем
+                    self._forget(batch)
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_exception(e)
+                else:
+                    self._pending[:0] = batch
+                return
+            finally:
+                self._idle.set()
+
+            self._forget(batch)
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+            logger.debug(f"Flushed {len(batch)} log entries")
+
+    def _forget(self, batch):
+        for _, key, totals in batch:
+            self._pending_counts[key] -= 1
+            if self._pending_counts[key] == 0:
+                del self._pending_counts[key]
+                del self._pending_totals[key]
+            else:
+                self._pending_totals[key].subtract(totals)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
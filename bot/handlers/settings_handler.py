@@ -1,16 +1,51 @@
 import asyncio
+import os
+import tempfile
+import time
 from aiogram import Bot, Dispatcher, Router, types, F
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
 from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 import re
-from bot.utils.logging import logger
+from bot.utils.logging import logger, SAMPLED
 from bot.db.crud import create_db
-from bot.db.crud import create_log_tables
+from bot.db.crud import close_db, pool
+from bot.db.fsm_storage import SQLiteStorage
+from bot.db.crud import start_log_writer, stop_log_writer
+from bot.utils.http import close_session
+from bot.utils.metrics import MetricsMiddleware, start_metrics_server
+from bot.utils.throttling import ThrottlingMiddleware, TokenBucketLimiter
 from bot.db.crud import get_user_by_id
-from config.config import BOT_TOKEN
+from config.config import (
+    BOT_TOKEN,
+    BOT_MODE,
+    TELEGRAM_API_URL,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    FSM_STATE_TTL_SECONDS,
+    FSM_FLUSH_INTERVAL_SECONDS,
+    FSM_CACHE_SIZE,
+    THROTTLE_RATE,
+    THROTTLE_BURST,
+    THROTTLE_UPSTREAM_RATE,
+    THROTTLE_UPSTREAM_BURST,
+    THROTTLE_MAX_USERS,
+    REMINDER_INTERVAL_MINUTES,
+    REMINDER_START_HOUR,
+    REMINDER_END_HOUR,
+    REMINDER_BATCH_SIZE,
+    REMINDER_POLL_INTERVAL_SECONDS,
+    OUTBOX_GLOBAL_RATE,
+    OUTBOX_CHAT_RATE,
+    OUTBOX_CHAT_BURST,
+    OUTBOX_CONCURRENCY,
+    OUTBOX_MAX_RETRIES,
+    OUTBOX_MAX_CHATS,
+    OUTBOX_DRAIN_TIMEOUT_SECONDS,
+)
 from bot.db.crud import (
     add_user,
     update_user,
@@ -18,23 +53,77 @@ from bot.db.crud import (
     log_food,
     log_exercise,
     get_daily_summary,
+    get_history,
+    flush_log_writer,
 )
+from bot.db.compaction import start_compaction
+from bot.utils.goals import start_goal_recalculation
+from bot.utils.reminders import ReminderScheduler
+from bot.utils.outbox import OutboundDispatcher, BULK
 from bot.utils.calculation import (
-    calculate_exercise_calories,
+    calories_for_met,
     calculate_calorie_goal,
     calculate_water_goal,
     get_food_info,
     get_weather,
+    summarize_history,
 )
-from bot.utils.calculation import EXTRA_WATER_ACTIVITY
+from bot.utils.calculation import DEFAULT_MET, EXTRA_WATER_ACTIVITY
+from bot.utils.exercises import find_exercise, load_exercises
 
-bot = Bot(token=BOT_TOKEN)
-storage = MemoryStorage()
+session = (
+    AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+    if TELEGRAM_API_URL
+    else None
+)
+bot = Bot(token=BOT_TOKEN, session=session)
+storage = SQLiteStorage(
+    pool,
+    ttl=FSM_STATE_TTL_SECONDS,
+    flush_interval=FSM_FLUSH_INTERVAL_SECONDS,
+    max_cached=FSM_CACHE_SIZE,
+)
 dp = Dispatcher(storage=storage)
 router = Router()
+router.message.middleware(MetricsMiddleware())
+router.callback_query.middleware(MetricsMiddleware())
 dp.include_router(router)
 
 
+background_tasks = []
+outbox = OutboundDispatcher(
+    global_rate=OUTBOX_GLOBAL_RATE,
+    chat_rate=OUTBOX_CHAT_RATE,
+    chat_burst=OUTBOX_CHAT_BURST,
+    concurrency=OUTBOX_CONCURRENCY,
+    max_retries=OUTBOX_MAX_RETRIES,
+    max_chats=OUTBOX_MAX_CHATS,
+)
+
+
+async def send_water_reminder(user_id, water_left):
+    outbox.send_message(
+        bot,
+        user_id,
+        f"💧 Не забудьте выпить воды! До дневной нормы осталось {round(water_left)} мл.",
+        priority=BULK,
+    )
+
+
+reminders = ReminderScheduler(
+    send=send_water_reminder,
+    interval=REMINDER_INTERVAL_MINUTES * 60,
+    start_hour=REMINDER_START_HOUR,
+    end_hour=REMINDER_END_HOUR,
+    batch_size=REMINDER_BATCH_SIZE,
+    poll_interval=REMINDER_POLL_INTERVAL_SECONDS,
+)
+
+DEFAULT_HISTORY_DAYS = 7
+MAX_HISTORY_DAYS = 365
+HISTORY_DAYS_SHOWN = 14
+
+
 class ProfileSetup(StatesGroup):
     weight = State()
     height = State()
@@ -52,11 +141,26 @@ class FoodLogState(StatesGroup):
     waiting_for_food_amount = State()
 
 
+throttling = ThrottlingMiddleware(
+    limiters={
+        "default": TokenBucketLimiter(THROTTLE_RATE, THROTTLE_BURST, THROTTLE_MAX_USERS),
+        "upstream": TokenBucketLimiter(
+            THROTTLE_UPSTREAM_RATE, THROTTLE_UPSTREAM_BURST, THROTTLE_MAX_USERS
+        ),
+    },
+    upstream_commands={"/log_food"},
+    upstream_states={ProfileSetup.city.state},
+    outbox=outbox,
+)
+dp.message.outer_middleware(throttling)
+dp.callback_query.outer_middleware(throttling)
+
+
 @router.message(F.text == "/set_profile")
 async def set_profile_handler(message: types.Message, state: FSMContext):
-    await message.answer("Введите ваш вес (в кг):")
+    outbox.answer(message, "Введите ваш вес (в кг):")
     await state.set_state(ProfileSetup.weight)
-    logger.info(f"User {message.from_user.id} requested /set_profile")
+    logger.info(f"User {message.from_user.id} requested /set_profile", extra=SAMPLED)
 
 
 @router.message(ProfileSetup.weight)
@@ -64,10 +168,10 @@ async def set_weight(message: types.Message, state: FSMContext):
     try:
         weight = int(message.text)
         await state.update_data(weight=weight)
-        await message.answer("Введите ваш рост (в см):")
+        outbox.answer(message, "Введите ваш рост (в см):")
         await state.set_state(ProfileSetup.height)
     except ValueError:
-        await message.answer("🚫 Пожалуйста, введите числовое значение для веса.")
+        outbox.answer(message, "🚫 Пожалуйста, введите числовое значение для веса.")
 
 
 @router.message(ProfileSetup.height)
@@ -75,10 +179,10 @@ async def set_height(message: types.Message, state: FSMContext):
     try:
         height = int(message.text)
         await state.update_data(height=height)
-        await message.answer("Введите ваш возраст:")
+        outbox.answer(message, "Введите ваш возраст:")
         await state.set_state(ProfileSetup.age)
     except ValueError:
-        await message.answer("🚫 Пожалуйста, введите числовое значение для роста.")
+        outbox.answer(message, "🚫 Пожалуйста, введите числовое значение для роста.")
 
 
 @router.message(ProfileSetup.age)
@@ -86,10 +190,10 @@ async def set_age(message: types.Message, state: FSMContext):
     try:
         age = int(message.text)
         await state.update_data(age=age)
-        await message.answer("Сколько минут активности у вас в день?")
+        outbox.answer(message, "Сколько минут активности у вас в день?")
         await state.set_state(ProfileSetup.activity)
     except ValueError:
-        await message.answer("🚫 Пожалуйста, введите числовое значение для возраста.")
+        outbox.answer(message, "🚫 Пожалуйста, введите числовое значение для возраста.")
 
 
 @router.message(ProfileSetup.activity)
@@ -97,17 +201,17 @@ async def set_activity(message: types.Message, state: FSMContext):
     try:
         activity = int(message.text)
         await state.update_data(activity=activity)
-        await message.answer("В каком городе вы находитесь? Например, Порту.")
+        outbox.answer(message, "В каком городе вы находитесь? Например, Порту.")
         await state.set_state(ProfileSetup.city)
     except ValueError:
-        await message.answer("🚫 Пожалуйста, введите числовое значение для активности.")
+        outbox.answer(message, "🚫 Пожалуйста, введите числовое значение для активности.")
 
 
 @router.message(ProfileSetup.city)
 async def set_city(message: types.Message, state: FSMContext):
     try:
         city = message.text
-        get_weather(city)
+        await get_weather(city)
         data = await state.get_data()
 
         weight = data["weight"]
@@ -115,7 +219,8 @@ async def set_city(message: types.Message, state: FSMContext):
         age = data["age"]
         activity = data["activity"]
 
-        waiting_message = await message.answer(
+        waiting_message = outbox.answer(
+            message,
             "🔄 Составляю план, пожалуйста, подождите..."
         )
         await asyncio.sleep(2)
@@ -123,7 +228,7 @@ async def set_city(message: types.Message, state: FSMContext):
         calorie_goal = calculate_calorie_goal(
             weight=weight, height=height, age=age, activity_minutes=activity
         )
-        water_goal = calculate_water_goal(
+        water_goal = await calculate_water_goal(
             weight=weight, activity_minutes=activity, city=city
         )
 
@@ -135,6 +240,7 @@ async def set_city(message: types.Message, state: FSMContext):
             activity=activity,
             calorie_goal=calorie_goal,
             water_goal=water_goal,
+            custom_water_goal=False,
         )
 
         keyboard_calorie_goal = InlineKeyboardMarkup(
@@ -143,13 +249,16 @@ async def set_city(message: types.Message, state: FSMContext):
                 [InlineKeyboardButton(text="Нет", callback_data="calorie_goal_no")],
             ]
         )
-        await waiting_message.edit_text(
+        outbox.edit_text(
+            waiting_message,
             f"🌱☀️ Я рекомендую придерживаться следующей цели по калориям: {round(calorie_goal)} ккал.\n\n"
             f"❓ Вы согласны с этой целью?",
             reply_markup=keyboard_calorie_goal,
+            chat_id=message.chat.id,
         )
     except ValueError:
-        await message.answer(
+        outbox.answer(
+            message,
             "🚫 Не можем найти такой город. Пожалуйста, попробуйте еще раз."
         )
 
@@ -158,16 +267,16 @@ async def set_city(message: types.Message, state: FSMContext):
 async def set_custom_calorie_goal(message: types.Message, state: FSMContext):
     custom_calorie_goal = int(message.text)
     await state.update_data(calorie_goal=custom_calorie_goal)
-    await message.answer("✅ Цель по калориям установлена.")
+    outbox.answer(message, "✅ Цель по калориям установлена.")
     await ask_water_goal(message, state)
 
 
 @router.message(ProfileSetup.set_custom_water_goal, F.text.regexp(r"^\d+$"))
 async def set_custom_water_goal(message: types.Message, state: FSMContext):
     custom_water_goal = int(message.text)
-    await state.update_data(water_goal=custom_water_goal)
-    await message.answer("✅ Цель по воде установлена.")
-    await finalize_profile(message, state)
+    await state.update_data(water_goal=custom_water_goal, custom_water_goal=True)
+    outbox.answer(message, "✅ Цель по воде установлена.")
+    await finalize_profile(message, state, message.from_user)
 
 
 @router.callback_query(lambda c: c.data and c.data.startswith("calorie_goal_"))
@@ -177,7 +286,8 @@ async def handle_calorie_goal_confirmation(
     if callback_query.data == "calorie_goal_yes":
         await ask_water_goal(callback_query.message, state)
     else:
-        await callback_query.message.edit_text(
+        outbox.edit_text(
+            callback_query.message,
             "💬 Пожалуйста, введите свою цель по калориям (например: 2000):"
         )
         await state.set_state(ProfileSetup.set_custom_calorie_goal)
@@ -193,7 +303,8 @@ async def ask_water_goal(message: types.Message, state: FSMContext):
             [InlineKeyboardButton(text="Нет", callback_data="water_goal_no")],
         ]
     )
-    await message.answer(
+    outbox.answer(
+        message,
         f"💧 Я рекомендую вам выпивать {round(water_goal)} мл воды в день.\n\n"
         f"❓ Вы согласны с этой целью?",
         reply_markup=keyboard_water_goal,
@@ -205,17 +316,19 @@ async def handle_water_goal_confirmation(
     callback_query: types.CallbackQuery, state: FSMContext
 ):
     if callback_query.data == "water_goal_yes":
-        await finalize_profile(callback_query.message, state)
+        # Сообщение с кнопками отправил бот, поэтому пользователь берется из самого callback
+        await finalize_profile(callback_query.message, state, callback_query.from_user)
     else:
-        await callback_query.message.edit_text(
+        outbox.edit_text(
+            callback_query.message,
             "💬 Пожалуйста, введите свою цель по воде (в мл):"
         )
         await state.set_state(ProfileSetup.set_custom_water_goal)
 
 
-async def finalize_profile(message: types.Message, state: FSMContext):
+async def finalize_profile(message: types.Message, state: FSMContext, user: types.User):
     data = await state.get_data()
-    existing_user = get_user_by_id(message.from_user.id)
+    existing_user = await get_user_by_id(user.id)
     weight = data["weight"]
     height = data["height"]
     age = data["age"]
@@ -231,7 +344,8 @@ async def finalize_profile(message: types.Message, state: FSMContext):
                 [InlineKeyboardButton(text="Нет", callback_data="update_profile_no")],
             ]
         )
-        await message.answer(
+        outbox.answer(
+            message,
             "Профиль уже существует. Хотите обновить информацию?", reply_markup=keyboard
         )
 
@@ -245,9 +359,9 @@ async def finalize_profile(message: types.Message, state: FSMContext):
             water_goal=water_goal,
         )
     else:
-        add_user(
-            user_id=message.from_user.id,
-            username=message.from_user.username,
+        await add_user(
+            user_id=user.id,
+            username=user.username,
             weight=weight,
             height=height,
             age=age,
@@ -255,8 +369,10 @@ async def finalize_profile(message: types.Message, state: FSMContext):
             city=city,
             water_goal=water_goal,
             calorie_goal=calorie_goal,
+            custom_water_goal=data.get("custom_water_goal", False),
         )
-        await message.answer(
+        outbox.answer(
+            message,
             f"Ваш профиль создан!\nЦель воды: {round(water_goal)} мл\nЦель калорий: {round(calorie_goal)} ккал."
         )
         await state.clear()
@@ -268,7 +384,7 @@ async def handle_update_confirmation(
 ):
     if callback_query.data == "update_profile_yes":
         data = await state.get_data()
-        update_user(
+        await update_user(
             user_id=callback_query.from_user.id,
             weight=data["weight"],
             height=data["height"],
@@ -277,26 +393,28 @@ async def handle_update_confirmation(
             city=data["city"],
             water_goal=data["water_goal"],
             calorie_goal=data["calorie_goal"],
+            custom_water_goal=int(data.get("custom_water_goal", False)),
         )
-        await callback_query.message.edit_text(
+        outbox.edit_text(
+            callback_query.message,
             f"Ваш профиль успешно обновлен!\nЦель воды: {round(data['water_goal'])} мл\nЦель калорий: {round(data['calorie_goal'])} ккал."
         )
         await state.clear()
     elif callback_query.data == "update_profile_no":
-        await callback_query.message.edit_text("Ваш профиль остался без изменений.")
+        outbox.edit_text(callback_query.message, "Ваш профиль остался без изменений.")
         await state.clear()
 
 
 @router.message(Command("log_water"))
 async def log_water_handler(message: types.Message):
-    logger.info(f"User {message.from_user.id} requested /log_water")
+    logger.info(f"User {message.from_user.id} requested /log_water", extra=SAMPLED)
     try:
         match = re.search(r"[-+]?\d*[\.,]?\d+", message.text)
         if match:
             amount = match.group().replace(",", ".")
-            log_water(message.from_user.id, amount)
+            await log_water(message.from_user.id, amount)
 
-            user_summary = get_daily_summary(message.from_user.id)
+            user_summary = await get_daily_summary(message.from_user.id)
             water_left = (
                 user_summary.get("water_goal", 0)
                 - user_summary.get("total_water_ml", 0)
@@ -304,20 +422,23 @@ async def log_water_handler(message: types.Message):
             )
             message_log = f"💧 Записано {amount} мл воды."
             if water_left <= 0.0:
-                await message.answer(f"{message_log} Вы выполнили дневную норму воды!")
+                outbox.answer(message, f"{message_log} Вы выполнили дневную норму воды!")
             else:
-                await message.answer(
+                outbox.answer(
+                    message,
                     f"{message_log} Осталось выпить {round(water_left, 2)} мл."
                 )
 
-            logger.debug(f"Logged {amount} of water for user {message.from_user.id}")
+            logger.debug(f"Logged {amount} of water for user {message.from_user.id}", extra=SAMPLED)
         else:
             logger.debug(f"Cannot log water amount for user {message.from_user.id}")
-            await message.answer(
+            outbox.answer(
+                message,
                 "🚫 Пожалуйста, укажите количество воды в мл, например: /log_water 500"
             )
     except Exception as e:
-        await message.answer(
+        outbox.answer(
+            message,
             f"Возникла неизвестная ошибка. Пожалуйста, попробуйте еще раз."
         )
         logger.error(f"Cannot log water: {e}")
@@ -327,30 +448,35 @@ async def log_water_handler(message: types.Message):
 async def log_food_handler(
     message: types.Message, command: CommandObject, state: FSMContext
 ):
-    logger.info(f"User {message.from_user.id} requested /log_food")
+    logger.info(f"User {message.from_user.id} requested /log_food", extra=SAMPLED)
     food_name = command.args.strip() if command.args else None
 
     if not food_name:
-        await message.answer("❓ Укажите название продукта, например: /log_food банан")
+        outbox.answer(message, "❓ Укажите название продукта, например: /log_food банан")
         return
 
-    waiting_message = await message.answer(
+    waiting_message = outbox.answer(
+        message,
         "🔄 Ищу информацию о продукте, пожалуйста, подождите..."
     )
-    food_info = get_food_info(food_name)
+    food_info = await get_food_info(food_name)
 
     if not food_info:
-        await waiting_message.edit_text(
-            "🚫 Не удалось найти информацию о продукте. Попробуйте снова."
+        outbox.edit_text(
+            waiting_message,
+            "🚫 Не удалось найти информацию о продукте. Попробуйте снова.",
+            chat_id=message.chat.id,
         )
         return
 
     calories_per_100g = food_info.get("calories", 0.0)
     await state.update_data(food_name=food_name, calories_per_100g=calories_per_100g)
 
-    await waiting_message.edit_text(
+    outbox.edit_text(
+        waiting_message,
         f"🍌 {food_name.capitalize()} — {round(calories_per_100g)} ккал на 100 г.\n"
-        "Сколько грамм вы съели? Введите число."
+        "Сколько грамм вы съели? Введите число.",
+        chat_id=message.chat.id,
     )
     await state.set_state(FoodLogState.waiting_for_food_amount)
 
@@ -364,69 +490,90 @@ async def process_food_amount(message: types.Message, state: FSMContext):
 
         grams = int(message.text)
         calories = (calories_per_100g * grams) / 100
-        log_food(message.from_user.id, food_name, calories_per_100g, grams)
+        await log_food(message.from_user.id, food_name, calories_per_100g, grams)
 
-        await message.answer(
+        outbox.answer(
+            message,
             f"✅ Записано: {round(calories, 1)} ккал из {grams} г {food_name.capitalize()}.\n"
             f"Продолжайте следить за своим рационом! 🥗"
         )
         await state.clear()
     except ValueError:
-        await message.answer(
+        outbox.answer(
+            message,
             "🚫 Пожалуйста, введите числовое значение для веса продукта."
         )
 
 
 @router.message(FoodLogState.waiting_for_food_amount)
 async def handle_invalid_food_amount(message: types.Message, state: FSMContext):
-    await message.answer("🚫 Пожалуйста, введите числовое значение для веса продукта.")
+    outbox.answer(message, "🚫 Пожалуйста, введите числовое значение для веса продукта.")
     await state.set_state()
 
 
+def split_workout_args(args):
+    # Название может состоять из нескольких слов, длительность — последнее число,
+    # слова после него ("30 мин") пропускаем
+    position = max((i for i, arg in enumerate(args) if arg.isdigit()), default=len(args) - 1)
+    if position < 1:
+        return None
+    return " ".join(args[:position]), args[position]
+
+
 @router.message(Command("log_workout"))
 async def log_workout_handler(message: types.Message):
-    logger.info(f"User {message.from_user.id} requested /log_workout")
-    args = message.text.removeprefix("/log_workout").strip().split()
-    if len(args) < 2:
-        await message.answer(
+    logger.info(f"User {message.from_user.id} requested /log_workout", extra=SAMPLED)
+    workout = split_workout_args(message.text.removeprefix("/log_workout").split())
+    if workout is None:
+        outbox.answer(
+            message,
             "❓ Укажите тип тренировки и длительность, например:\n"
-            "/log_workout бег 30"
+            "/log_workout бег трусцой 30"
         )
         return
 
-    exercise_type, duration_minutes = args[0], args[1]
+    exercise_type, duration_minutes = workout
     try:
         duration_minutes = int(duration_minutes)
 
-        calories_burned = calculate_exercise_calories(exercise_type, duration_minutes)
+        exercise = find_exercise(exercise_type)
+        if exercise is not None:
+            exercise_type = exercise[0]
+        user = await get_user_by_id(message.from_user.id) or {}
+        met = exercise[1] if exercise is not None else DEFAULT_MET
+        calories_burned = calories_for_met(met, duration_minutes, user.get("weight"))
         extra_water = (duration_minutes / 30) * EXTRA_WATER_ACTIVITY
 
-        log_exercise(
+        await log_exercise(
             message.from_user.id, exercise_type, duration_minutes, calories_burned
         )
-        log_water(message.from_user.id, -extra_water)
+        await log_water(message.from_user.id, -extra_water)
 
-        await message.answer(
+        note = "" if exercise is not None else "\nℹ️ Такой тренировки нет в каталоге, посчитал как умеренную нагрузку."
+        outbox.answer(
+            message,
             f"🏋️‍♂️ {exercise_type.capitalize()}\n"
             f"- Продолжительность: {duration_minutes} мин\n"
             f"- Потрачено: {calories_burned:.1f} ккал\n"
             f"- Дополнительно выпейте: {extra_water:.1f} мл воды 💧"
+            f"{note}"
         )
     except ValueError:
-        await message.answer(
+        outbox.answer(
+            message,
             "🚫 Укажите длительность тренировки числом, например: /log_workout плавание 45"
         )
         logger.debug(f"Cannot log workout amount for user {message.from_user.id}")
     except Exception as e:
-        await message.answer("🚫 Ошибка при обработке тренировки. Попробуйте снова.")
+        outbox.answer(message, "🚫 Ошибка при обработке тренировки. Попробуйте снова.")
         logger.error(f"Cannot log workout: {e}")
 
 
 @router.message(Command("check_progress"))
 async def check_progress_handler(message: types.Message):
     try:
-        logger.info(f"User {message.from_user.id} requested /check_progress")
-        user_summary = get_daily_summary(message.from_user.id)
+        logger.info(f"User {message.from_user.id} requested /check_progress", extra=SAMPLED)
+        user_summary = await get_daily_summary(message.from_user.id)
 
         total_calories_consumed = user_summary.get("total_calories_consumed", 0)
         total_calories_burned = user_summary.get("total_calories_burned", 0)
@@ -437,7 +584,8 @@ async def check_progress_handler(message: types.Message):
             - user_summary.get("extra_water", 0)
         )
 
-        await message.answer(
+        outbox.answer(
+            message,
             "📊 Прогресс:\n"
             f"Вода:\n- Выпито: {total_water_ml:.1f} мл.\n"
             f"- Осталось: {water_delta if water_delta > 0 else 0:.1f} мл.\n\n"
@@ -447,10 +595,113 @@ async def check_progress_handler(message: types.Message):
             f"- Баланс: {round(total_calories_consumed - total_calories_burned)} ккал.\n"
         )
     except Exception as e:
-        await message.answer("🚫 Ошибка при получении данных. Попробуйте снова.")
+        outbox.answer(message, "🚫 Ошибка при получении данных. Попробуйте снова.")
         logger.error(f"Cannot log workout: {e}")
 
 
+@router.message(Command("history"))
+async def history_handler(message: types.Message, command: CommandObject):
+    logger.info(f"User {message.from_user.id} requested /history", extra=SAMPLED)
+    try:
+        days = int(command.args.strip()) if command.args else DEFAULT_HISTORY_DAYS
+    except ValueError:
+        outbox.answer(message, "❓ Укажите количество дней числом, например: /history 7")
+        return
+    days = max(1, min(days, MAX_HISTORY_DAYS))
+
+    try:
+        user = await get_user_by_id(message.from_user.id) or {}
+        first_day, history = await get_history(message.from_user.id, days)
+        report = summarize_history(
+            first_day,
+            days,
+            history,
+            water_goal=user.get("water_goal") or 0,
+            calorie_goal=user.get("calorie_goal") or 0,
+        )
+
+        lines = [
+            f"📅 История за {days} дн.:",
+            f"💧 В среднем выпито: {report['avg_water_ml']:.0f} мл/день",
+            f"🍽 В среднем потреблено: {round(report['avg_calories_consumed'])} ккал/день",
+            f"🏋️ В среднем потрачено: {round(report['avg_calories_burned'])} ккал/день",
+            f"✅ Норма воды выполнена: {report['water_goal_days']} из {days} дн.",
+            f"✅ Цель по калориям соблюдена: {report['calorie_goal_days']} из {days} дн.",
+            f"🔥 Текущая серия по воде: {report['water_streak']} дн. "
+            f"(лучшая: {report['best_water_streak']})",
+            "",
+        ]
+        for day in report["days"][-HISTORY_DAYS_SHOWN:]:
+            lines.append(
+                f"{day['day']}: 💧 {day['water_ml']:.0f} мл "
+                f"(ср. {day['water_rolling_avg']:.0f}) {'✅' if day['water_goal_met'] else '▫️'} | "
+                f"🍽 {round(day['calories_consumed'])} / 🏋️ {round(day['calories_burned'])} ккал"
+            )
+        outbox.answer(message, "\n".join(lines))
+    except Exception as e:
+        outbox.answer(message, "🚫 Ошибка при получении данных. Попробуйте снова.")
+        logger.error(f"Cannot build history: {e}")
+
+
+@router.message(Command("export"))
+async def export_handler(message: types.Message, command: CommandObject):
+    logger.info(f"User {message.from_user.id} requested /export", extra=SAMPLED)
+    fmt = command.args.strip().lower() if command.args else "csv"
+    if fmt not in ("csv", "jsonl"):
+        outbox.answer(message, "❓ Укажите формат выгрузки: /export csv или /export jsonl")
+        return
+
+    path = None
+    try:
+        await flush_log_writer()
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=f".{fmt}", encoding="utf-8", newline="", delete=False
+        ) as stream:
+            path = stream.name
+            from bot.db.export import export_logs
+
+            count = await pool.read(export_logs, stream, fmt, message.from_user.id)
+        if not count:
+            outbox.answer(message, "📭 У вас пока нет записей для выгрузки.")
+            return
+        # Файл удаляется после отправки, поэтому дожидаемся ее
+        await outbox.submit(
+            message.chat.id,
+            lambda: message.answer_document(
+                FSInputFile(path, filename=f"logs_{message.from_user.id}.{fmt}"),
+                caption=f"📦 Выгружено записей: {count}",
+            ),
+        )
+    except Exception as e:
+        outbox.answer(message, "🚫 Ошибка при выгрузке данных. Попробуйте снова.")
+        logger.error(f"Cannot export logs: {e}")
+    finally:
+        if path:
+            os.remove(path)
+
+
+@router.message(Command("reminders"))
+async def reminders_handler(message: types.Message, command: CommandObject):
+    logger.info(f"User {message.from_user.id} requested /reminders", extra=SAMPLED)
+    action = command.args.strip().lower() if command.args else None
+    if action == "on":
+        if not await get_user_by_id(message.from_user.id):
+            outbox.answer(message, "❓ Сначала настройте профиль: /set_profile")
+            return
+        await reminders.schedule(message.from_user.id)
+        outbox.answer(
+            message,
+            f"⏰ Напоминания включены. Я напомню о воде, если вы отстаете от нормы "
+            f"(каждые {REMINDER_INTERVAL_MINUTES} мин. с {REMINDER_START_HOUR}:00 до {REMINDER_END_HOUR}:00)."
+        )
+    elif action == "off":
+        await reminders.cancel(message.from_user.id)
+        outbox.answer(message, "🔕 Напоминания выключены.")
+    else:
+        status = "включены" if await reminders.is_enabled(message.from_user.id) else "выключены"
+        outbox.answer(message, f"⏰ Напоминания {status}. Используйте /reminders on или /reminders off")
+
+
 async def set_bot_commands():
     commands = [
         types.BotCommand(command="/set_profile", description="Настроить профиль"),
@@ -462,30 +713,71 @@ async def set_bot_commands():
         types.BotCommand(
             command="/check_progress", description="Показать прогресс за день"
         ),
+        types.BotCommand(command="/history", description="Показать историю за N дней"),
+        types.BotCommand(command="/export", description="Выгрузить свои записи"),
+        types.BotCommand(command="/reminders", description="Напоминания о воде"),
     ]
-    await bot.set_my_commands(commands)
+    try:
+        await bot.set_my_commands(commands)
+    except Exception as e:
+        logger.error(f"Cannot set bot commands: {e}")
 
 
-async def main():
-    create_db()
-    create_log_tables()
-    logger.debug("Databases are configured.")
+async def start_services():
+    load_exercises()
+    # Долгие миграции (индексы на больших логах) достраиваются уже во время работы
+    migrations = await create_db(background=True)
+    if migrations is not None:
+        background_tasks.append(migrations)
+    start_log_writer()
+    await storage.start()
+    outbox.start()
+    await reminders.start()
+
+
+async def main(started=None):
+    started = started or time.perf_counter()
+    logger.info(f"Modules imported in {time.perf_counter() - started:.3f}s")
+    await start_services()
+    logger.info(f"Storage ready in {time.perf_counter() - started:.3f}s")
+
+    for task in (start_compaction(), start_goal_recalculation()):
+        if task is not None:
+            background_tasks.append(task)
 
     dp.shutdown.register(on_shutdown)
     dp.startup.register(on_startup)
+    dp["started_at"] = started
 
     try:
-        await dp.start_polling(bot)
+        if BOT_MODE == "webhook":
+            from bot.webhook import run_webhook
+
+            await run_webhook(dp, bot)
+        else:
+            metrics_runner = await start_metrics_server(WEBHOOK_HOST, WEBHOOK_PORT)
+            try:
+                await bot.delete_webhook()
+                await dp.start_polling(bot)
+            finally:
+                await metrics_runner.cleanup()
     finally:
         await bot.session.close()
 
-    await dp.start_polling(bot)
-
 
-async def on_startup():
-    await set_bot_commands()
-    logger.info("Bot launched!")
+async def on_startup(started_at: float):
+    # Команды меню не нужны для обработки апдейтов, не ждем ответа Telegram
+    background_tasks.append(asyncio.create_task(set_bot_commands()))
+    logger.info(f"Bot launched in {time.perf_counter() - started_at:.3f}s!")
 
 
 async def on_shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await reminders.stop()
+    await outbox.stop(OUTBOX_DRAIN_TIMEOUT_SECONDS)
+    await close_session()
+    await stop_log_writer()
+    await storage.close()
+    await close_db()
     logger.info("Bot stopped!")
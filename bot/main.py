@@ -1,6 +1,9 @@
 import asyncio
-from bot.handlers.settings_handler import main
+import time
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    started = time.perf_counter()
+    from bot.handlers.settings_handler import main
+
+    asyncio.run(main(started))
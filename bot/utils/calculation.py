@@ -1,13 +1,31 @@
-import requests
-from config.config import WEATHER_API_KEY
-from bot.utils.logging import logger
+import asyncio
+import time
+from datetime import timedelta
+from collections import Counter, deque
+import aiohttp
+from config.config import (
+    WEATHER_API_KEY,
+    FOOD_SEARCH_URL,
+    WEATHER_FORECAST_URL,
+    HTTP_TIMEOUT_SECONDS,
+    FOOD_CACHE_SIZE,
+    FOOD_CACHE_TTL_SECONDS,
+    FOOD_NEGATIVE_CACHE_TTL_SECONDS,
+    WEATHER_CACHE_SIZE,
+    WEATHER_CACHE_TTL_SECONDS,
+)
+from bot.db.crud import get_cached_food, save_cached_food, search_local_food
+from bot.utils.cache import TTLCache
+from bot.utils.exercises import find_exercise
+from bot.utils.http import get_session
+from bot.utils.logging import logger, SAMPLED
+from bot.utils.metrics import track_upstream
 
 BASE_WATER_MULTIPLIER = 30  # мл воды на кг веса
 BASE_WATER_ACTIVITY = 500  # мл за 30 минут активности
 EXTRA_WATER_ACTIVITY = 200  # мл за 30 минут тренировки
 EXTRA_WATER_HOT_WEATHER = 500  # мл за жаркую погоду
 HOT_WEATHER_THRESHOLD = 25  # °C
-DEFAULT_TIMEOUT_SECONDS = 10
 
 CALORIE_MULTIPLIER = {
     "weight": 10,
@@ -15,65 +33,137 @@ CALORIE_MULTIPLIER = {
     "age": 5,
 }
 
-EXERCISE_CALORIES = {
-    "бег": 10,  # ккал/мин
-    "ходьба": 5,
-    "плавание": 8,
-    "велосипед": 7,
-}
+_MISSING = object()
+food_cache = TTLCache(maxsize=FOOD_CACHE_SIZE, ttl=FOOD_CACHE_TTL_SECONDS)
+food_cache_stats = Counter()
+weather_cache = TTLCache(maxsize=WEATHER_CACHE_SIZE, ttl=WEATHER_CACHE_TTL_SECONDS)
+_weather_requests = {}
+
+DEFAULT_WEIGHT = 70  # кг, если вес в профиле не указан
+DEFAULT_MET = 5.0  # упражнение не нашлось в каталоге: считаем умеренной нагрузкой
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+async def search_food(product_name):
+    params = {
+        "action": "process",
+        "search_terms": product_name,
+        "json": "true",
+    }
+    with track_upstream("openfoodfacts"):
+        async with get_session().get(FOOD_SEARCH_URL, params=params) as response:
+            response.raise_for_status()
+            data = await response.json(content_type=None)
+
+    products = data.get("products", [])
+    if not products:  # Проверяем, есть ли найденные продукты
+        return None
+    first_product = products[0]
+    food_info_result = {
+        "name": first_product.get("product_name", "Неизвестно"),
+        "calories": first_product.get("nutriments", {}).get("energy-kcal_100g", 0),
+    }
+    logger.debug(f"Found food {food_info_result['name']}", extra=SAMPLED)
+    return food_info_result
+
+
+async def get_food_info(product_name):
+    key = normalize_name(product_name)
+
+    food_info_result = food_cache.get(key, _MISSING)
+    if food_info_result is not _MISSING:
+        return food_info_result
 
+    food_info_result = await search_local_food(key)
+    if food_info_result is not None:
+        food_cache_stats["local_hits"] += 1
+        food_cache.set(key, food_info_result)
+        return food_info_result
 
-def get_food_info(product_name):
-    url = f"https://world.openfoodfacts.org/cgi/search.pl?action=process&search_terms={product_name}&json=true"
-    food_info_result = None
+    cached = await get_cached_food(key)
+    if cached is not None:
+        food_info_result, expires_at = cached
+        food_cache_stats["db_hits"] += 1
+        food_cache.set(key, food_info_result, ttl=expires_at - time.time())
+        return food_info_result
+
+    food_cache_stats["remote_lookups"] += 1
     try:
-        response = requests.get(url, timeout=DEFAULT_TIMEOUT_SECONDS)
-        if response.status_code == 200:
-            data = response.json()
-            products = data.get("products", [])
-            if products:  # Проверяем, есть ли найденные продукты
-                first_product = products[0]
-                food_info_result = {
-                    "name": first_product.get("product_name", "Неизвестно"),
-                    "calories": first_product.get("nutriments", {}).get(
-                        "energy-kcal_100g", 0
-                    ),
-                }
-                logger.debug(food_info_result)
-    except requests.exceptions.Timeout:
-        logger.error(f"Request timed out after {DEFAULT_TIMEOUT_SECONDS} seconds.")
+        food_info_result = await search_food(key)
+    except asyncio.TimeoutError:
+        logger.error(f"Request timed out after {HTTP_TIMEOUT_SECONDS} seconds.")
+        return None
     except Exception as e:
         logger.error(f"Cannot find food: {e}")
+        return None
 
+    # Ненайденные продукты тоже кешируем, но ненадолго
+    ttl = FOOD_CACHE_TTL_SECONDS if food_info_result else FOOD_NEGATIVE_CACHE_TTL_SECONDS
+    food_cache.set(key, food_info_result, ttl=ttl)
+    await save_cached_food(key, food_info_result, ttl)
     return food_info_result
 
 
-def get_weather(city: str) -> dict:
-
-    response = requests.get(
-        url="http://api.openweathermap.org/data/2.5/forecast",
-        params={"q": city, "appid": WEATHER_API_KEY, "units": "metric"},
-    )
-    if response.status_code != 200:
+async def fetch_weather(city: str) -> float:
+    if not WEATHER_API_KEY:
+        # aiohttp не принимает None в параметрах запроса, поэтому без ключа даже не ходим в API
+        logger.error("WEATHER_API_KEY is not set")
+        raise ValueError("Ошибка при получении данных о погоде.")
+    params = {"q": city, "appid": WEATHER_API_KEY, "units": "metric"}
+    try:
+        with track_upstream("openweathermap"):
+            async with get_session().get(WEATHER_FORECAST_URL, params=params) as response:
+                if response.status != 200:
+                    raise ValueError("Ошибка при получении данных о погоде.")
+                forecast_data = await response.json(content_type=None)
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+        logger.error(f"Weather request failed: {e!r}")
         raise ValueError("Ошибка при получении данных о погоде.")
 
-    forecast_data = response.json()
-    tomorrow_temp = forecast_data["list"][1]["main"]["temp"]
+    try:
+        tomorrow_temp = forecast_data["list"][1]["main"]["temp"]
+    except (KeyError, IndexError, TypeError) as e:
+        logger.error(f"Unexpected weather response: {e!r}")
+        raise ValueError("Ошибка при получении данных о погоде.")
     logger.debug(f"Get weather forecast in {city}: {tomorrow_temp}")
+    weather_cache.set(city, tomorrow_temp)
     return tomorrow_temp
 
 
-def calculate_water_goal(weight: float, activity_minutes: int, city: str) -> float:
+async def get_weather(city: str) -> float:
+    key = normalize_name(city)
+    tomorrow_temp = weather_cache.get(key)
+    if tomorrow_temp is not None:
+        return tomorrow_temp
+
+    # Одновременные запросы по одному городу ждут один и тот же вызов API
+    task = _weather_requests.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch_weather(key))
+        _weather_requests[key] = task
+        task.add_done_callback(lambda _: _weather_requests.pop(key, None))
+    return await asyncio.shield(task)
+
+
+def water_goal_for_temperature(weight: float, activity_minutes: int, temperature=None) -> float:
     water_goal = weight * BASE_WATER_MULTIPLIER
     water_goal += (activity_minutes / 30) * BASE_WATER_ACTIVITY
+    if temperature is not None and temperature > HOT_WEATHER_THRESHOLD:
+        water_goal += EXTRA_WATER_HOT_WEATHER
+    return water_goal
+
+
+async def calculate_water_goal(weight: float, activity_minutes: int, city: str) -> float:
+    tomorrow_temp = None
     try:
-        tomorrow_temp = get_weather(city)
-        if tomorrow_temp > HOT_WEATHER_THRESHOLD:
-            water_goal += EXTRA_WATER_HOT_WEATHER
+        tomorrow_temp = await get_weather(city)
     except ValueError as e:
         logger.error(f"Get weather API error: {e}")
 
-    return water_goal
+    return water_goal_for_temperature(weight, activity_minutes, tomorrow_temp)
 
 
 def calculate_calorie_goal(
@@ -91,6 +181,52 @@ def calculate_calorie_goal(
     return calorie_goal
 
 
-def calculate_exercise_calories(exercise_type: str, duration_minutes: int) -> float:
-    calories_per_minute = EXERCISE_CALORIES.get(exercise_type.lower(), 6)
-    return calories_per_minute * duration_minutes
+def calories_for_met(met: float, duration_minutes: int, weight: float = DEFAULT_WEIGHT) -> float:
+    # ккал/мин = MET * 3.5 мл O2 на кг в минуту * вес / 200
+    return met * 3.5 * (weight or DEFAULT_WEIGHT) / 200 * duration_minutes
+
+
+def calculate_exercise_calories(exercise_type: str, duration_minutes: int, weight: float = DEFAULT_WEIGHT) -> float:
+    exercise = find_exercise(exercise_type)
+    return calories_for_met(exercise[1] if exercise else DEFAULT_MET, duration_minutes, weight)
+
+
+def summarize_history(first_day, days, history, water_goal, calorie_goal, window=7):
+    daily = []
+    water_window = deque(maxlen=window)
+    water_streak = best_water_streak = 0
+    for offset in range(days):
+        day = (first_day + timedelta(days=offset)).isoformat()
+        totals = history.get(day, {})
+        water = totals.get("total_water_ml", 0)
+        water_left = water_goal - water - totals.get("extra_water", 0)
+        consumed = totals.get("total_calories_consumed", 0)
+        burned = totals.get("total_calories_burned", 0)
+        water_goal_met = bool(water_goal) and water_left <= 0
+        calorie_goal_met = bool(consumed) and consumed - burned <= calorie_goal
+
+        # Скользящее среднее и серии считаем за один проход по дням
+        water_window.append(water)
+        water_streak = water_streak + 1 if water_goal_met else 0
+        best_water_streak = max(best_water_streak, water_streak)
+
+        daily.append({
+            "day": day,
+            "water_ml": water,
+            "calories_consumed": consumed,
+            "calories_burned": burned,
+            "water_goal_met": water_goal_met,
+            "calorie_goal_met": calorie_goal_met,
+            "water_rolling_avg": sum(water_window) / len(water_window),
+        })
+
+    return {
+        "days": daily,
+        "avg_water_ml": sum(d["water_ml"] for d in daily) / days,
+        "avg_calories_consumed": sum(d["calories_consumed"] for d in daily) / days,
+        "avg_calories_burned": sum(d["calories_burned"] for d in daily) / days,
+        "water_goal_days": sum(d["water_goal_met"] for d in daily),
+        "calorie_goal_days": sum(d["calorie_goal_met"] for d in daily),
+        "water_streak": water_streak,
+        "best_water_streak": best_water_streak,
+    }
@@ -0,0 +1,131 @@
+import csv
+import functools
+import re
+import time
+from collections import Counter, defaultdict
+from config.config import EXERCISE_CATALOG_PATH, EXERCISE_MATCH_THRESHOLD
+from bot.utils.logging import logger
+
+_NON_WORD = re.compile(r"[\W_]+")
+# Доля триграмм названия, которая должна найтись в запросе вида "утренний бег в парке"
+CONTAINMENT_THRESHOLD = 0.8
+# Сколько кандидатов с наибольшим числом общих триграмм проверяем расстоянием редактирования
+EDIT_CANDIDATES = 8
+
+_index = None
+
+
+def normalize_exercise(name: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", name.lower().replace("ё", "е")).split())
+
+
+def _trigrams(key):
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b, limit):
+    # Расстояние Дамерау-Левенштейна (с перестановкой соседних букв), обрывается после limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+def read_catalog(path):
+    with open(path, encoding="utf-8", newline="") as file:
+        for row in csv.DictReader(file):
+            aliases = [alias for alias in row["aliases"].split(";") if alias]
+            yield row["name"], float(row["met"]), aliases
+
+
+class ExerciseIndex:
+    def __init__(self, catalog, threshold):
+        self._threshold = threshold
+        self._exercises = []
+        self._exact = {}
+        # Для каждого названия и синонима: упражнение и число триграмм; по триграмме — номера ключей
+        self._keys = []
+        self._postings = defaultdict(list)
+        for name, met, aliases in catalog:
+            exercise = (name, met)
+            self._exercises.append(exercise)
+            for alias in (name, *aliases):
+                key = normalize_exercise(alias)
+                if not key:
+                    continue
+                if key in self._exact:
+                    if self._exact[key] != exercise:
+                        logger.warning(f"Exercise alias {alias!r} is already used by {self._exact[key][0]!r}")
+                    continue
+                self._exact[key] = exercise
+                grams = _trigrams(key)
+                for gram in grams:
+                    self._postings[gram].append(len(self._keys))
+                self._keys.append((key, exercise, len(grams)))
+
+    def __len__(self):
+        return len(self._exercises)
+
+    def search(self, query):
+        key = normalize_exercise(query)
+        exercise = self._exact.get(key)
+        if exercise is not None or not key:
+            return exercise
+
+        grams = _trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings:
+                shared.update(postings)
+
+        best, best_score = None, self._threshold
+        contained, contained_grams = None, 0
+        for key_id, count in shared.items():
+            _, exercise, size = self._keys[key_id]
+            # Коэффициент Дайса ловит опечатки, вхождение — лишние слова вокруг названия
+            score = 2 * count / (len(grams) + size)
+            if score >= best_score:
+                best, best_score = exercise, score
+            if count >= size * CONTAINMENT_THRESHOLD and count > contained_grams:
+                contained, contained_grams = exercise, count
+        if best is None:
+            best = self._closest(key, shared)
+        return best or contained
+
+    def _closest(self, key, shared):
+        # У коротких слов одна опечатка портит половину триграмм, поэтому проверяем по буквам
+        limit = 1 if len(key) < 8 else 2
+        best, best_distance = None, limit + 1
+        for key_id, _ in shared.most_common(EDIT_CANDIDATES):
+            candidate, exercise, _ = self._keys[key_id]
+            distance = _edit_distance(key, candidate, limit)
+            if distance < best_distance:
+                best, best_distance = exercise, distance
+        return best
+
+
+def load_exercises(path=EXERCISE_CATALOG_PATH):
+    global _index
+    started = time.perf_counter()
+    _index = ExerciseIndex(read_catalog(path), EXERCISE_MATCH_THRESHOLD)
+    find_exercise.cache_clear()
+    logger.info(f"Loaded {len(_index)} exercises in {time.perf_counter() - started:.3f}s")
+    return _index
+
+
+@functools.lru_cache(maxsize=4096)
+def find_exercise(name):
+    # (название, MET) ближайшего упражнения из каталога или None
+    index = _index or load_exercises()
+    return index.search(name)
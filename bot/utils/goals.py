@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from bot.db.crud import pool, invalidate_profiles, close_db
+from bot.utils.calculation import get_weather, normalize_name, water_goal_for_temperature
+from bot.utils.http import close_session
+from bot.utils.logging import logger
+from config.config import GOAL_RECALC_HOUR, GOAL_RECALC_BATCH_SIZE, GOAL_RECALC_CONCURRENCY
+
+
+def _select_cities(conn):
+    rows = conn.execute('SELECT DISTINCT city FROM users WHERE custom_water_goal = 0 AND city IS NOT NULL')
+    return [row[0] for row in rows]
+
+
+def _select_users(conn, after_user_id, batch_size):
+    return conn.execute('''SELECT user_id, weight, activity, city FROM users
+                           WHERE user_id > ? AND custom_water_goal = 0
+                           ORDER BY user_id LIMIT ?''', (after_user_id, batch_size)).fetchall()
+
+
+def _update_goals(conn, goals):
+    try:
+        conn.executemany('UPDATE users SET water_goal = ? WHERE user_id = ?', goals)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+async def fetch_temperatures(cities, concurrency):
+    # Погода запрашивается один раз на город, а не на пользователя
+    semaphore = asyncio.Semaphore(concurrency)
+    temperatures = {}
+
+    async def fetch(city):
+        key = normalize_name(city)
+        if key in temperatures:
+            return
+        temperatures[key] = None
+        async with semaphore:
+            try:
+                temperatures[key] = await get_weather(key)
+            except ValueError as e:
+                logger.error(f"Cannot get weather for {city}: {e}")
+
+    await asyncio.gather(*(fetch(city) for city in cities))
+    return temperatures
+
+
+async def recalculate_water_goals(batch_size=GOAL_RECALC_BATCH_SIZE, concurrency=GOAL_RECALC_CONCURRENCY):
+    started = time.perf_counter()
+    cities = await pool.read(_select_cities)
+    temperatures = await fetch_temperatures(cities, concurrency)
+
+    updated = 0
+    last_user_id = -1
+    while True:
+        users = await pool.read(_select_users, last_user_id, batch_size)
+        if not users:
+            break
+        last_user_id = users[-1][0]
+        goals = [
+            (round(water_goal_for_temperature(weight or 0, activity or 0, temperatures.get(normalize_name(city)))),
+             user_id)
+            for user_id, weight, activity, city in users
+            if city and temperatures.get(normalize_name(city)) is not None
+        ]
+        if goals:
+            await pool.run(_update_goals, goals)
+            updated += len(goals)
+
+    invalidate_profiles()
+    logger.info(f"Recalculated water goals for {updated} users in {len(cities)} cities "
+                f"in {time.perf_counter() - started:.1f}s")
+    return updated
+
+
+def seconds_until(hour):
+    now = datetime.now()
+    next_run = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+async def run_goal_recalculation():
+    while True:
+        await asyncio.sleep(seconds_until(GOAL_RECALC_HOUR))
+        try:
+            # Цели пересчитывает один из процессов, которые делят базу
+            async with pool.job_lock("goal recalculation") as locked:
+                if locked:
+                    await recalculate_water_goals()
+                else:
+                    logger.info("Water goal recalculation is already running in another process")
+        except Exception as e:
+            logger.error(f"Water goal recalculation failed: {e}")
+
+
+def start_goal_recalculation():
+    if GOAL_RECALC_HOUR >= 0:
+        return asyncio.create_task(run_goal_recalculation())
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalculate water goals from tomorrow's forecast.")
+    parser.add_argument("--batch-size", type=int, default=GOAL_RECALC_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=GOAL_RECALC_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    async def run():
+        try:
+            return await recalculate_water_goals(args.batch_size, args.concurrency)
+        finally:
+            await close_session()
+            await close_db()
+
+    print(f"Updated {asyncio.run(run())} users")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+import aiohttp
+from config.config import HTTP_TIMEOUT_SECONDS, HTTP_POOL_SIZE, HTTP_LIMIT_PER_HOST
+
+_session = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    # Одна сессия на процесс: keep-alive соединения переиспользуются между запросами
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            limit_per_host=HTTP_LIMIT_PER_HOST,
+            ttl_dns_cache=300,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS),
+        )
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
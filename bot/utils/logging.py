@@ -1,11 +1,95 @@
+import atexit
+import copy
+import json
 import logging
-from config.config import LOG_FILE
-
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-    handlers=[logging.FileHandler(LOG_FILE), logging.StreamHandler()],
+import logging.handlers
+import queue
+import random
+import signal
+from config.config import (
+    LOG_FILE,
+    LOG_LEVEL,
+    LOG_FORMAT,
+    LOG_MAX_BYTES,
+    LOG_BACKUP_COUNT,
+    LOG_ROTATE_WHEN,
+    LOG_SAMPLE_RATE,
 )
 
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+# extra для частых событий: такие записи попадают в лог с вероятностью LOG_SAMPLE_RATE
+SAMPLED = {"sample_rate": LOG_SAMPLE_RATE}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    def filter(self, record):
+        rate = getattr(record, "sample_rate", 1.0)
+        return rate >= 1 or random.random() < rate
+
+
+class DeferredFormatQueueHandler(logging.handlers.QueueHandler):
+    # Стандартный prepare форматирует запись и стирает exc_info, тогда JsonFormatter
+    # не видит исключения. Здесь подставляем только аргументы, остальное оформит слушатель
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _file_handler():
+    if LOG_ROTATE_WHEN:
+        return logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    return logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+
+
+def set_log_level(level):
+    logging.getLogger().setLevel(level)
+    logger.info(f"Log level set to {logging.getLevelName(logging.getLogger().level)}")
+
+
+def _toggle_debug(signum, frame):
+    set_log_level(logging.INFO if logging.getLogger().level == logging.DEBUG else logging.DEBUG)
+
+
+formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+handlers = [_file_handler(), logging.StreamHandler()]
+for handler in handlers:
+    handler.setFormatter(formatter)
+
+# Запись на диск и в консоль идет в отдельном потоке, чтобы не блокировать event loop
+log_queue = queue.SimpleQueue()
+queue_handler = DeferredFormatQueueHandler(log_queue)
+queue_handler.addFilter(SamplingFilter())
+listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop)
+
+logging.basicConfig(level=LOG_LEVEL, handlers=[queue_handler])
+
+if hasattr(signal, "SIGUSR1"):
+    try:
+        signal.signal(signal.SIGUSR1, _toggle_debug)
+    except ValueError:
+        pass
+
 logger = logging.getLogger(__name__)
 logger.info("Logger is configured.")
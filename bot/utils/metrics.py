@@ -0,0 +1,93 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from aiohttp import web
+from aiogram import BaseMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+HANDLER_LATENCY = Histogram(
+    "bot_handler_latency_seconds", "Aiogram handler latency", ["handler"]
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total", "Unhandled aiogram handler errors", ["handler"]
+)
+DB_QUERY_LATENCY = Histogram(
+    "bot_db_query_latency_seconds", "Database statement latency", ["statement"]
+)
+DB_QUERY_ERRORS = Counter(
+    "bot_db_query_errors_total", "Failed database statements", ["statement"]
+)
+UPSTREAM_LATENCY = Histogram(
+    "bot_upstream_latency_seconds", "Outbound API call latency", ["upstream"]
+)
+UPSTREAM_ERRORS = Counter(
+    "bot_upstream_errors_total", "Failed outbound API calls", ["upstream", "error"]
+)
+
+THROTTLED_EVENTS = Counter(
+    "bot_throttled_events_total", "Updates dropped by the rate limiter", ["budget"]
+)
+OUTBOUND_QUEUE_DELAY = Histogram(
+    "bot_outbound_queue_delay_seconds", "Time outbound messages wait in the queue", ["priority"]
+)
+OUTBOUND_RETRIES = Counter(
+    "bot_outbound_retries_total", "Retried outbound Telegram calls", ["reason"]
+)
+
+
+def statement_type(query: str) -> str:
+    return query.lstrip().split(None, 1)[0].upper() if query.strip() else "EMPTY"
+
+
+@contextmanager
+def track_query(statement):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        DB_QUERY_ERRORS.labels(statement).inc()
+        raise
+    finally:
+        DB_QUERY_LATENCY.labels(statement).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def track_upstream(upstream):
+    started = time.perf_counter()
+    try:
+        yield
+    except asyncio.TimeoutError:
+        UPSTREAM_ERRORS.labels(upstream, "timeout").inc()
+        raise
+    except Exception as e:
+        UPSTREAM_ERRORS.labels(upstream, type(e).__name__).inc()
+        raise
+    finally:
+        UPSTREAM_LATENCY.labels(upstream).observe(time.perf_counter() - started)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    async def __call__(self, handler, event, data):
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.labels(name).inc()
+            raise
+        finally:
+            HANDLER_LATENCY.labels(name).observe(time.perf_counter() - started)
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(body=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+async def start_metrics_server(host, port):
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,172 @@
+import asyncio
+import heapq
+import itertools
+import time
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from bot.utils.logging import logger
+from bot.utils.metrics import OUTBOUND_QUEUE_DELAY, OUTBOUND_RETRIES, track_upstream
+from bot.utils.throttling import TokenBucketLimiter
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+
+class OutboundDispatcher:
+    def __init__(self, global_rate, chat_rate, chat_burst, concurrency, max_retries, max_chats):
+        self._global = TokenBucketLimiter(global_rate, global_rate, 1)
+        self._chats = TokenBucketLimiter(chat_rate, chat_burst, max_chats)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._max_retries = max_retries
+        self._seq = itertools.count()
+        # Готовые к отправке задания: (приоритет, номер, ...)
+        self._ready = []
+        # Задания, ждущие лимита чата: (время готовности, приоритет, номер, ...)
+        self._delayed = []
+        self._blocked = {}
+        self._tails = {}
+        self._tasks = set()
+        self._wakeup = asyncio.Event()
+        self._runner = None
+
+    @property
+    def pending(self):
+        return len(self._ready) + len(self._delayed) + len(self._tasks)
+
+    def submit(self, chat_id, call, priority=INTERACTIVE):
+        # call — функция без аргументов, возвращающая корутину запроса к Telegram
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._ready, (priority, next(self._seq), time.monotonic(), chat_id, call, future)
+        )
+        self._wakeup.set()
+        return future
+
+    def answer(self, message, text, priority=INTERACTIVE, **kwargs):
+        return self.submit(message.chat.id, lambda: message.answer(text, **kwargs), priority)
+
+    def send_message(self, bot, chat_id, text, priority=BULK, **kwargs):
+        return self.submit(chat_id, lambda: bot.send_message(chat_id, text, **kwargs), priority)
+
+    def edit_text(self, message, text, priority=INTERACTIVE, chat_id=None, **kwargs):
+        # message может быть future от answer (тогда нужен chat_id): сообщение еще не отправлено
+        async def call():
+            target = await message if isinstance(message, asyncio.Future) else message
+            return await target.edit_text(text, **kwargs)
+
+        return self.submit(chat_id or message.chat.id, call, priority)
+
+    def start(self):
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self, timeout):
+        # Дожидаемся отправки очереди, но не дольше timeout секунд
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        dropped = self._ready + [job[1:] for job in self._delayed]
+        for job in dropped:
+            job[-1].cancel()
+        self._ready, self._delayed = [], []
+        if dropped:
+            logger.warning(f"Dropped {len(dropped)} outbound messages on shutdown")
+
+    def _release_delayed(self, now):
+        while self._delayed and self._delayed[0][0] <= now:
+            job = heapq.heappop(self._delayed)
+            heapq.heappush(self._ready, job[1:])
+        for chat_id in [chat_id for chat_id, until in self._blocked.items() if until <= now]:
+            del self._blocked[chat_id]
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            self._release_delayed(now)
+            if not self._ready:
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job = heapq.heappop(self._ready)
+            chat_id = job[3]
+            # Пока чат ждет лимита, его новые сообщения встают за уже отложенными
+            until = self._blocked.get(chat_id)
+            if until is None:
+                delay = self._chats.reserve(chat_id)
+                if delay:
+                    until = self._blocked[chat_id] = now + delay
+            if until is not None:
+                heapq.heappush(self._delayed, (until, *job))
+                continue
+
+            delay = self._global.reserve(None)
+            if delay:
+                await asyncio.sleep(delay)
+            self._dispatch(*job)
+
+    def _dispatch(self, priority, seq, queued_at, chat_id, call, future):
+        OUTBOUND_QUEUE_DELAY.labels(PRIORITY_NAMES.get(priority, str(priority))).observe(
+            time.monotonic() - queued_at
+        )
+        # Сообщения одного чата уходят строго по очереди
+        previous = self._tails.get(chat_id)
+        task = asyncio.create_task(self._send(chat_id, call, future, previous))
+        self._tasks.add(task)
+        self._tails[chat_id] = task
+        task.add_done_callback(lambda t: self._done(chat_id, t))
+
+    def _done(self, chat_id, task):
+        self._tasks.discard(task)
+        if self._tails.get(chat_id) is task:
+            del self._tails[chat_id]
+
+    async def _send(self, chat_id, call, future, previous):
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
+            await self._deliver(chat_id, call, future)
+        finally:
+            if not future.done():
+                future.cancel()
+
+    async def _deliver(self, chat_id, call, future):
+        for attempt in range(self._max_retries + 1):
+            try:
+                async with self._semaphore:
+                    with track_upstream("telegram"):
+                        result = await call()
+            except TelegramRetryAfter as e:
+                OUTBOUND_RETRIES.labels("retry_after").inc()
+                self._chats.block(chat_id, e.retry_after)
+                delay = e.retry_after
+                error = e
+            except (TelegramNetworkError, TelegramServerError) as e:
+                OUTBOUND_RETRIES.labels(type(e).__name__).inc()
+                delay = 2 ** attempt
+                error = e
+            except Exception as e:
+                error = e
+                break
+            else:
+                if not future.done():
+                    future.set_result(result)
+                return
+            if attempt < self._max_retries:
+                await asyncio.sleep(delay)
+
+        logger.error(f"Cannot send message to chat {chat_id}: {error}")
+        if not future.done():
+            future.set_exception(error)
+            # Ошибка уже залогирована, даже если результат никто не ждет
+            future.exception()
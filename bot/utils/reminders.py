@@ -0,0 +1,96 @@
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+from bot.db.crud import (
+    claim_reminders,
+    delete_reminders,
+    get_reminder,
+    get_water_progress,
+    next_reminder_due,
+    save_reminder,
+)
+from bot.utils.logging import logger
+
+
+class ReminderScheduler:
+    # Очередь — сама таблица reminders с индексом по due_at: процессы, которые делят базу,
+    # забирают наступившие напоминания через claim_reminders и не отправляют их дважды
+    def __init__(self, send, interval, start_hour, end_hour, batch_size, poll_interval):
+        self._send = send
+        self._interval = interval
+        self._start_hour = start_hour
+        self._end_hour = end_hour
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._task = None
+
+    def next_due(self, now=None):
+        now = now or datetime.now()
+        due = now + timedelta(seconds=self._interval)
+        if due.hour < self._start_hour:
+            due = due.replace(hour=self._start_hour, minute=0, second=0, microsecond=0)
+        elif due.hour >= self._end_hour or due.date() != now.date():
+            due = (now + timedelta(days=1)).replace(hour=self._start_hour, minute=0, second=0, microsecond=0)
+        return int(due.timestamp())
+
+    async def is_enabled(self, user_id):
+        return await get_reminder(user_id) is not None
+
+    async def schedule(self, user_id, due_at=None):
+        await save_reminder(user_id, due_at or self.next_due())
+        self._wakeup.set()
+
+    async def cancel(self, user_id):
+        await delete_reminders([user_id])
+
+    async def start(self):
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            # Цикл завершается сам: отмена посреди рассылки потеряла бы уже забранную пачку
+            self._stopping.set()
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    async def _fire(self, user_ids):
+        progress = await get_water_progress(user_ids, date.today().isoformat())
+        # Профиль удален: напоминания больше не нужны
+        deleted = [user_id for user_id in user_ids if user_id not in progress]
+        if deleted:
+            await delete_reminders(deleted)
+        for user_id in user_ids:
+            water_left = progress.get(user_id, 0)
+            if water_left > 0:
+                try:
+                    await self._send(user_id, water_left)
+                except Exception as e:
+                    logger.error(f"Cannot send water reminder to {user_id}: {e}")
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            now = time.time()
+            next_due_at = None
+            try:
+                due_users = await claim_reminders(int(now), self.next_due(), self._batch_size)
+                if due_users:
+                    await self._fire(due_users)
+                    continue
+                next_due_at = await next_reminder_due()
+            except Exception as e:
+                logger.error(f"Water reminders failed: {e}")
+
+            # Напоминания, которые включили в других процессах, подхватываются не позже poll_interval
+            timeout = self._poll_interval
+            if next_due_at is not None:
+                timeout = min(max(next_due_at - now, 0), timeout)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
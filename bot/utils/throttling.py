@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+from aiogram import BaseMiddleware, types
+from aiogram.dispatcher.event.bases import UNHANDLED
+from bot.utils.logging import logger
+from bot.utils.metrics import THROTTLED_EVENTS
+
+THROTTLED_MESSAGE = "⏳ Слишком много запросов. Пожалуйста, подождите немного."
+
+
+class TokenBucketLimiter:
+    def __init__(self, rate, capacity, maxsize):
+        self.rate = rate
+        self.capacity = capacity
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+
+    def _refill(self, key):
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [self.capacity, now, False]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        return bucket
+
+    def consume(self, key):
+        # Возвращает (разрешено, первое ли это отклонение подряд)
+        bucket = self._refill(key)
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            bucket[2] = False
+            return True, False
+        first_rejection = not bucket[2]
+        bucket[2] = True
+        return False, first_rejection
+
+    def reserve(self, key):
+        # Списывает токен и возвращает 0 либо число секунд до появления токена
+        bucket = self._refill(key)
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0
+        return (1 - bucket[0]) / self.rate
+
+    def block(self, key, seconds):
+        # Ближайший токен появится не раньше, чем через seconds секунд
+        bucket = self._refill(key)
+        bucket[0] = min(bucket[0], 1 - seconds * self.rate)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    def __init__(self, limiters, upstream_commands, upstream_states, outbox):
+        self.limiters = limiters
+        self.upstream_commands = upstream_commands
+        self.upstream_states = upstream_states
+        self.outbox = outbox
+
+    def classify(self, event, data):
+        if data.get("raw_state") in self.upstream_states:
+            return "upstream"
+        text = event.text if isinstance(event, types.Message) else None
+        if text and text.split(maxsplit=1)[0].split("@")[0] in self.upstream_commands:
+            return "upstream"
+        return "default"
+
+    @staticmethod
+    def chat_id(event, user):
+        if isinstance(event, types.Message):
+            return event.chat.id
+        if isinstance(event, types.CallbackQuery) and event.message is not None:
+            return event.message.chat.id
+        return user.id
+
+    async def __call__(self, handler, event, data):
+        user = getattr(event, "from_user", None)
+        if user is None:
+            return await handler(event, data)
+
+        budget = self.classify(event, data)
+        allowed, first_rejection = self.limiters[budget].consume(user.id)
+        if allowed:
+            return await handler(event, data)
+
+        THROTTLED_EVENTS.labels(budget).inc()
+        # Пользователь получает одно предупреждение на всю серию отброшенных сообщений
+        if first_rejection:
+            logger.info(f"Throttling user {user.id} ({budget})")
+            # Через очередь отправки, как и все ответы бота: предупреждение подчиняется лимитам Telegram
+            self.outbox.submit(self.chat_id(event, user), lambda: event.answer(THROTTLED_MESSAGE))
+        # Как и апдейт без подходящего хендлера: диспетчер и нагрузочный тест видят, что он не обработан
+        return UNHANDLED
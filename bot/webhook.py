@@ -0,0 +1,107 @@
+import asyncio
+import signal
+from aiohttp import web
+from aiogram import Bot, Dispatcher, types
+from config.config import (
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    UPDATE_CONCURRENCY,
+    UPDATE_MAX_PENDING,
+)
+from bot.utils.logging import logger
+from bot.utils.metrics import metrics_handler
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def get_update_user_id(update: types.Update):
+    event = update.event
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return user.id
+    chat = getattr(event, "chat", None)
+    if chat is not None:
+        return chat.id
+    return None
+
+
+class UpdateProcessor:
+    def __init__(self, dp: Dispatcher, bot: Bot, concurrency: int, max_pending: int):
+        self._dp = dp
+        self._bot = bot
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._max_pending = max_pending
+        self._tails = {}
+        self._tasks = set()
+
+    @property
+    def pending(self):
+        return len(self._tasks)
+
+    def submit(self, update: types.Update):
+        # Апдейты одного пользователя обрабатываются строго по очереди
+        key = get_update_user_id(update)
+        previous = self._tails.get(key) if key is not None else None
+        task = asyncio.create_task(self._process(update, previous))
+        self._tasks.add(task)
+        if key is not None:
+            self._tails[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+
+    def _done(self, key, task):
+        self._tasks.discard(task)
+        if key is not None and self._tails.get(key) is task:
+            del self._tails[key]
+
+    async def _process(self, update: types.Update, previous):
+        if previous is not None:
+            await asyncio.wait([previous])
+        async with self._semaphore:
+            try:
+                await self._dp.feed_update(self._bot, update)
+            except Exception as e:
+                logger.error(f"Cannot process update {update.update_id}: {e}")
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if WEBHOOK_SECRET and request.headers.get(SECRET_HEADER) != WEBHOOK_SECRET:
+            return web.Response(status=401)
+        if self.pending >= self._max_pending:
+            # Telegram повторит доставку позже
+            return web.Response(status=503)
+        data = await request.json()
+        update = types.Update.model_validate(data, context={"bot": self._bot})
+        self.submit(update)
+        return web.Response()
+
+    async def wait_closed(self):
+        if self._tasks:
+            await asyncio.wait(self._tasks)
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    processor = UpdateProcessor(dp, bot, UPDATE_CONCURRENCY, UPDATE_MAX_PENDING)
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, processor.handle)
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await dp.emit_startup(bot=bot, **dp.workflow_data)
+    try:
+        if WEBHOOK_URL:
+            await bot.set_webhook(url=WEBHOOK_URL + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET or None)
+        await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+        logger.info(f"Webhook server is listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+        await stop_event.wait()
+    finally:
+        await runner.cleanup()
+        await processor.wait_closed()
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)
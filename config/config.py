@@ -6,4 +6,72 @@ load_dotenv(dotenv_path="bot.env")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 LOG_FILE = "data/logs/bot.log"
 DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
+FOOD_SEARCH_URL = os.getenv("FOOD_SEARCH_URL", "https://world.openfoodfacts.org/cgi/search.pl")
+WEATHER_FORECAST_URL = os.getenv("WEATHER_FORECAST_URL", "http://api.openweathermap.org/data/2.5/forecast")
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "20"))
+FOOD_CACHE_SIZE = int(os.getenv("FOOD_CACHE_SIZE", "1024"))
+FOOD_CACHE_TTL_SECONDS = int(os.getenv("FOOD_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+FOOD_NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv("FOOD_NEGATIVE_CACHE_TTL_SECONDS", "600"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "1024"))
+WEATHER_CACHE_TTL_SECONDS = int(os.getenv("WEATHER_CACHE_TTL_SECONDS", str(3 * 3600)))
+LOG_WRITE_BEHIND = os.getenv("LOG_WRITE_BEHIND", "0") == "1"
+LOG_FLUSH_INTERVAL_MS = int(os.getenv("LOG_FLUSH_INTERVAL_MS", "50"))
+LOG_FLUSH_MAX_ROWS = int(os.getenv("LOG_FLUSH_MAX_ROWS", "500"))
+LOG_WRITE_DURABLE = os.getenv("LOG_WRITE_DURABLE", "0") == "1"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8000"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "64"))
+UPDATE_MAX_PENDING = int(os.getenv("UPDATE_MAX_PENDING", "10000"))
+FSM_STATE_TTL_SECONDS = int(os.getenv("FSM_STATE_TTL_SECONDS", str(24 * 3600)))
+FSM_FLUSH_INTERVAL_SECONDS = float(os.getenv("FSM_FLUSH_INTERVAL_SECONDS", "1"))
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "100000"))
+PROFILE_CACHE_TTL_SECONDS = int(os.getenv("PROFILE_CACHE_TTL_SECONDS", "3600"))
+# Серверную базу делят несколько процессов бота: профиль, измененный другим процессом, виден через этот срок
+PROFILE_CACHE_SHARED_TTL_SECONDS = int(os.getenv("PROFILE_CACHE_SHARED_TTL_SECONDS", "5"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "1"))
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST", "5"))
+THROTTLE_UPSTREAM_RATE = float(os.getenv("THROTTLE_UPSTREAM_RATE", "0.2"))
+THROTTLE_UPSTREAM_BURST = int(os.getenv("THROTTLE_UPSTREAM_BURST", "3"))
+THROTTLE_MAX_USERS = int(os.getenv("THROTTLE_MAX_USERS", "100000"))
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "0"))
+COMPACTION_BATCH_SIZE = int(os.getenv("COMPACTION_BATCH_SIZE", "5000"))
+COMPACTION_INTERVAL_SECONDS = int(os.getenv("COMPACTION_INTERVAL_SECONDS", "3600"))
+VACUUM_PAGES = int(os.getenv("VACUUM_PAGES", "1000"))
+GOAL_RECALC_HOUR = int(os.getenv("GOAL_RECALC_HOUR", "3"))
+GOAL_RECALC_BATCH_SIZE = int(os.getenv("GOAL_RECALC_BATCH_SIZE", "5000"))
+GOAL_RECALC_CONCURRENCY = int(os.getenv("GOAL_RECALC_CONCURRENCY", "10"))
+REMINDER_INTERVAL_MINUTES = int(os.getenv("REMINDER_INTERVAL_MINUTES", "120"))
+REMINDER_START_HOUR = int(os.getenv("REMINDER_START_HOUR", "9"))
+REMINDER_END_HOUR = int(os.getenv("REMINDER_END_HOUR", "21"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+REMINDER_POLL_INTERVAL_SECONDS = float(os.getenv("REMINDER_POLL_INTERVAL_SECONDS", "30"))
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "30"))
+OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1"))
+OUTBOX_CHAT_BURST = int(os.getenv("OUTBOX_CHAT_BURST", "3"))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "30"))
+OUTBOX_MAX_RETRIES = int(os.getenv("OUTBOX_MAX_RETRIES", "5"))
+OUTBOX_MAX_CHATS = int(os.getenv("OUTBOX_MAX_CHATS", "100000"))
+OUTBOX_DRAIN_TIMEOUT_SECONDS = float(os.getenv("OUTBOX_DRAIN_TIMEOUT_SECONDS", "10"))
+EXERCISE_CATALOG_PATH = os.getenv("EXERCISE_CATALOG_PATH", "data/exercises.csv")
+EXERCISE_MATCH_THRESHOLD = float(os.getenv("EXERCISE_MATCH_THRESHOLD", "0.5"))
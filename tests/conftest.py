@@ -0,0 +1,82 @@
+import asyncio
+import os
+
+import pytest
+
+# Без этого первый запрос вне фикстур открыл бы базу из bot.env
+os.environ["DATABASE_URL"] = ":memory:"
+# Модуль хендлеров создает Bot при импорте, токен нужен только синтаксически верный
+os.environ.setdefault("BOT_TOKEN", "42:test")
+
+from bot.db import crud  # noqa: E402
+from bot.db.pool import create_pool  # noqa: E402
+
+# sqlite3-пул, SQLAlchemy поверх SQLite и PostgreSQL. Сервер берется из TEST_DATABASE_URL, например
+# postgresql+asyncpg://postgres@localhost/bot_test, а без него запускается временный из пакета pgserver
+BACKENDS = ["sqlite", "sqlalchemy-sqlite", "postgresql"]
+
+
+def _clear(conn):
+    from bot.db.schema import metadata
+
+    for table in reversed(metadata.sorted_tables):
+        conn.execute(f"DELETE FROM {table.name}")
+    conn.commit()
+
+
+def _runner(url, clear=False):
+    # Сценарий выполняется на чистой базе; пул создается и закрывается в одном event loop
+    def run(scenario):
+        async def main():
+            crud.pool = create_pool(url, 2, crud.SQLITE_PRAGMAS)
+            crud.invalidate_profiles()
+            try:
+                await crud.create_db()
+                if clear:
+                    await crud.pool.run(_clear)
+                return await scenario()
+            finally:
+                await crud.close_db()
+
+        return asyncio.run(main())
+
+    return run
+
+
+def _database_url(backend, request, tmp_path):
+    if backend == "sqlite":
+        return str(tmp_path / "bot.db")
+    pytest.importorskip("sqlalchemy")
+    if backend == "sqlalchemy-sqlite":
+        pytest.importorskip("aiosqlite")
+        return f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}"
+    return request.getfixturevalue("postgres_url")
+
+
+@pytest.fixture(scope="session")
+def postgres_url(tmp_path_factory):
+    url = os.getenv("TEST_DATABASE_URL")
+    if url:
+        yield url
+        return
+    pytest.importorskip("asyncpg")
+    pgserver = pytest.importorskip("pgserver")
+    server = pgserver.get_server(tmp_path_factory.mktemp("pgdata"), cleanup_mode="delete")
+    try:
+        yield server.get_uri().replace("postgresql://", "postgresql+asyncpg://", 1)
+    finally:
+        server.cleanup()
+
+
+@pytest.fixture
+def run_db(tmp_path):
+    def run(scenario, name="bot.db"):
+        return _runner(str(tmp_path / name))(scenario)
+
+    return run
+
+
+@pytest.fixture(params=BACKENDS)
+def run_backend(request, tmp_path):
+    # Каждый запуск начинается с пустых таблиц, в том числе на общей серверной базе
+    return _runner(_database_url(request.param, request, tmp_path), clear=True)
@@ -0,0 +1,104 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from bot.db import crud
+from bot.db.compaction import _freelist_count, _incremental_vacuum, compact_logs
+from bot.db.export import export_logs, import_logs
+from bot.db.migrations import LOG_TABLES
+
+USER_ID = 1
+HISTORY_DAYS = 60
+RETENTION_DAYS = 30
+
+
+def _entries():
+    # Два месяца логов: старая половина попадет под компакцию, свежая останется
+    now = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    entries = []
+    for days_ago in range(HISTORY_DAYS):
+        timestamp = now - timedelta(days=days_ago)
+        day = timestamp.date().isoformat()
+        for values in (
+            {"timestamp": timestamp, "day": day, "amount_ml": 250.0},
+            {"timestamp": timestamp, "day": day, "amount_ml": -200.0},
+            {"timestamp": timestamp, "day": day, "food": "банан", "calories_per_100g": 89.0, "grams": 150.0},
+            {"timestamp": timestamp, "day": day, "exercise_type": "бег", "duration_minutes": 30.0,
+             "calories_burned": 10.0 + days_ago},
+        ):
+            table = ("water_logs" if "amount_ml" in values
+                     else "food_logs" if "food" in values else "exercise_logs")
+            entries.append((table, USER_ID, crud.entry_totals(table, values), values))
+    return entries
+
+
+async def _seed():
+    await crud.add_user(USER_ID, "user", 70, 180, 30, 45, "Порту", 2500, 2000)
+    await crud.pool.run(crud.insert_logs, _entries())
+
+
+async def _summaries():
+    return await crud.get_daily_summary(USER_ID), await crud.get_history(USER_ID, HISTORY_DAYS)
+
+
+def _count_logs(conn):
+    return sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in LOG_TABLES)
+
+
+def test_summaries_unchanged_by_compaction(run_backend):
+    async def scenario():
+        await _seed()
+        before = await _summaries()
+        rows_before = await crud.pool.read(_count_logs)
+        deleted = await compact_logs(RETENTION_DAYS, batch_size=7, pause=0)
+        rows_after = await crud.pool.read(_count_logs)
+        return before, await _summaries(), rows_before, deleted, rows_after
+
+    before, after, rows_before, deleted, rows_after = run_backend(scenario)
+    # Удаляются дни строго старше RETENTION_DAYS
+    assert deleted == 4 * (HISTORY_DAYS - RETENTION_DAYS - 1)
+    assert rows_after == rows_before - deleted
+    assert after == before
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_export_import_keeps_compacted_totals(run_backend, fmt):
+    async def compacted():
+        await _seed()
+        summaries = await _summaries()
+        await compact_logs(RETENTION_DAYS, pause=0)
+        stream = io.StringIO()
+        await crud.pool.read(export_logs, stream, fmt, USER_ID)
+        return summaries, stream.getvalue()
+
+    before, dump = run_backend(compacted)
+
+    async def imported():
+        await crud.add_user(USER_ID, "user", 70, 180, 30, 45, "Порту", 2500, 2000)
+        await crud.pool.run(import_logs, io.StringIO(dump), fmt)
+        return await _summaries()
+
+    # Очищенная база восстанавливает сводки и за дни, сырые логи которых уже удалены
+    assert run_backend(imported) == before
+
+
+def test_incremental_vacuum_frees_requested_pages(run_backend):
+    def fill_and_delete(conn):
+        conn.executemany("INSERT INTO food_cache (name, found, product_name) VALUES (?, 0, ?)",
+                         [(f"food{i}", "x" * 1000) for i in range(500)])
+        conn.commit()
+        conn.execute("DELETE FROM food_cache")
+        conn.commit()
+
+    async def scenario():
+        if not crud.is_sqlite():
+            pytest.skip("auto_vacuum is SQLite-only")
+        await crud.pool.run(fill_and_delete)
+        before = await crud.pool.read(_freelist_count)
+        assert await crud.pool.run(_incremental_vacuum, 50)
+        return before, await crud.pool.read(_freelist_count)
+
+    before, after = run_backend(scenario)
+    assert before > 50
+    assert after == before - 50
@@ -0,0 +1,169 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from bot.db import crud
+from bot.db.migrations import migrate
+from bot.db.pool import create_pool
+
+USER_ID = 1
+
+
+async def _add_user(user_id=USER_ID, water_goal=2500):
+    await crud.add_user(user_id, "user", 70, 180, 30, 45, "Порту", water_goal, 2000)
+
+
+def test_users(run_backend):
+    async def scenario():
+        await _add_user()
+        created = await crud.get_user_by_id(USER_ID)
+        with pytest.raises(ValueError):
+            await _add_user()
+        await crud.update_user(USER_ID, weight=75, custom_water_goal=1)
+        updated = await crud.get_user_by_id(USER_ID)
+        await crud.delete_user(USER_ID)
+        return created, updated, await crud.get_user_by_id(USER_ID)
+
+    created, updated, deleted = run_backend(scenario)
+    assert created["city"] == "Порту"
+    assert created["custom_water_goal"] == 0
+    assert (updated["weight"], updated["custom_water_goal"]) == (75, 1)
+    assert deleted is None
+
+
+def test_profile_cache_expires_on_shared_database(run_backend, monkeypatch):
+    def rename(conn):
+        conn.execute("UPDATE users SET username = ? WHERE user_id = ?", ("renamed", USER_ID))
+        conn.commit()
+
+    async def scenario():
+        await _add_user()
+        await crud.get_user_by_id(USER_ID)
+        # Профиль меняет другой процесс, в обход кеша этого
+        await crud.pool.run(rename)
+        return crud.is_shared(), (await crud.get_user_by_id(USER_ID))["username"]
+
+    monkeypatch.setattr(crud, "PROFILE_CACHE_SHARED_TTL_SECONDS", 0)
+    shared, username = run_backend(scenario)
+    assert username == ("renamed" if shared else "user")
+
+
+def test_logs_roll_up_into_summaries(run_backend):
+    async def scenario():
+        await _add_user()
+        await crud.log_water(USER_ID, 500)
+        await crud.log_water(USER_ID, -200)
+        await crud.log_food(USER_ID, "банан", 89, 150)
+        await crud.log_exercise(USER_ID, "бег", 30, 300)
+        return await crud.get_daily_summary(USER_ID), await crud.get_history(USER_ID, 7)
+
+    summary, (_, history) = run_backend(scenario)
+    assert summary == {
+        "water_goal": 2500,
+        "calorie_goal": 2000,
+        "total_water_ml": 500,
+        "extra_water": -200,
+        "total_calories_consumed": pytest.approx(133.5),
+        "total_calories_burned": 300,
+    }
+    assert list(history) == [date.today().isoformat()]
+    assert history[date.today().isoformat()]["total_water_ml"] == 500
+
+
+def test_water_progress(run_backend):
+    async def scenario():
+        await _add_user(1, water_goal=2000)
+        await _add_user(2, water_goal=3000)
+        await crud.log_water(1, 500)
+        await crud.log_water(1, -250)
+        return await crud.get_water_progress([1, 2, 3], date.today().isoformat(), chunk_size=1)
+
+    assert run_backend(scenario) == {1: 1750, 2: 3000}
+
+
+def test_food_cache_and_local_search(run_backend):
+    def add_product(conn):
+        conn.execute("INSERT INTO food_products (product_name, calories) VALUES (?, ?)", ("Банан сушеный", 320))
+        conn.commit()
+
+    async def scenario():
+        await crud.save_cached_food("банан", {"name": "Банан", "calories": 89}, ttl=60)
+        await crud.save_cached_food("банан", {"name": "Банан спелый", "calories": 95}, ttl=60)
+        await crud.save_cached_food("кирпич", None, ttl=60)
+        await crud.save_cached_food("устаревший", None, ttl=-1)
+        await crud.pool.run(add_product)
+        return (
+            await crud.get_cached_food("банан"),
+            await crud.get_cached_food("кирпич"),
+            await crud.get_cached_food("устаревший"),
+            await crud.search_local_food("сушеный"),
+        )
+
+    found, missing, expired, local = run_backend(scenario)
+    assert found[0] == {"name": "Банан спелый", "calories": 95}
+    assert missing[0] is None
+    assert expired is None
+    assert local == {"name": "Банан сушеный", "calories": 320}
+
+
+def test_reminders(run_backend):
+    async def scenario():
+        await crud.save_reminder(1, 100)
+        await crud.save_reminder(2, 200)
+        await crud.save_reminder(1, 150)
+        await crud.save_reminder(3, 1000)
+        await crud.delete_reminders([2])
+        return (await crud.get_reminder(1), await crud.get_reminder(2), await crud.next_reminder_due(),
+                await crud.claim_reminders(500, 2000, 10), await crud.next_reminder_due())
+
+    assert run_backend(scenario) == (150, None, 150, [1], 1000)
+
+
+def test_reminders_are_claimed_once(run_backend):
+    async def scenario():
+        for user_id in range(1, 41):
+            await crud.save_reminder(user_id, user_id)
+        # Два процесса забирают напоминания одновременно
+        claims = await asyncio.gather(*(crud.claim_reminders(100, 5000, 15) for _ in range(4)))
+        return claims, await crud.next_reminder_due()
+
+    claims, next_due = run_backend(scenario)
+    claimed = [user_id for claim in claims for user_id in claim]
+    assert sorted(claimed) == list(range(1, 41))
+    assert next_due == 5000
+
+
+def test_job_lock_is_held_by_one_process(run_backend):
+    async def scenario():
+        # Вложенный вызов берет блокировку с другого соединения, как второй процесс
+        async with crud.pool.job_lock("compaction") as first:
+            async with crud.pool.job_lock("compaction") as second:
+                pass
+            async with crud.pool.job_lock("goal recalculation") as other:
+                pass
+        async with crud.pool.job_lock("compaction") as again:
+            pass
+        return crud.is_shared(), (first, second, other, again)
+
+    shared, locks = run_backend(scenario)
+    # SQLite обслуживает один процесс, блокировка там не нужна
+    assert locks == ((True, False, True, True) if shared else (True, True, True, True))
+
+
+def test_sqlalchemy_in_memory_database():
+    pytest.importorskip("aiosqlite")
+
+    def count_users(conn):
+        return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    async def scenario():
+        # Для :memory: SQLAlchemy берет StaticPool, которому нельзя передать размер пула
+        pool = create_pool("sqlite+aiosqlite:///:memory:", 2, crud.SQLITE_PRAGMAS)
+        try:
+            await migrate(pool)
+            return await pool.read(count_users)
+        finally:
+            await pool.aclose()
+
+    assert asyncio.run(scenario()) == 0
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from bot.db import crud
+from bot.db.fsm_storage import SQLiteStorage, _save_states
+
+KEY = StorageKey(bot_id=42, chat_id=1, user_id=1)
+
+
+def _storage():
+    return SQLiteStorage(crud.pool, ttl=3600, flush_interval=60, max_cached=100)
+
+
+def test_states_survive_restart(run_backend):
+    async def scenario():
+        storage = _storage()
+        await storage.set_state(KEY, "ProfileSetup:city")
+        await storage.set_data(KEY, {"weight": 70})
+        await storage.close()
+        # Новый экземпляр читает то, что записал предыдущий при остановке
+        restarted = _storage()
+        state, data = await restarted.get_state(KEY), await restarted.get_data(KEY)
+        await restarted.set_state(KEY, None)
+        await restarted.set_data(KEY, {})
+        await restarted.close()
+        return state, data, await _storage().get_state(KEY)
+
+    assert run_backend(scenario) == ("ProfileSetup:city", {"weight": 70}, None)
+
+
+def test_close_waits_for_flush_in_progress():
+    class SlowPool:
+        dialect = "sqlite"
+
+        def __init__(self):
+            self.started, self.release = asyncio.Event(), asyncio.Event()
+            self.saved = []
+
+        async def run(self, func, *args):
+            if func is _save_states:
+                self.started.set()
+                await self.release.wait()
+                self.saved.extend(args[0])
+            return 0
+
+        async def read(self, func, *args):
+            return None
+
+    async def scenario():
+        pool = SlowPool()
+        storage = SQLiteStorage(pool, ttl=3600, flush_interval=0.01, max_cached=100)
+        await storage.start()
+        await storage.set_state(KEY, "ProfileSetup:city")
+        await pool.started.wait()
+        closing = asyncio.create_task(storage.close())
+        await asyncio.sleep(0)
+        pool.release.set()
+        await asyncio.wait_for(closing, 1)
+        return [(key, state) for key, state, _, _ in pool.saved]
+
+    assert asyncio.run(scenario()) == [(SQLiteStorage._make_key(KEY), "ProfileSetup:city")]
+
+
+def test_states_are_shared_between_processes(run_backend):
+    async def scenario():
+        if not crud.is_shared():
+            pytest.skip("SQLite is used by a single bot process")
+        # Два хранилища на одной базе — как два процесса бота: состояние видно сразу, без close()
+        first, second = _storage(), _storage()
+        await second.get_state(KEY)
+        await first.set_state(KEY, "ProfileSetup:city")
+        state = await second.get_state(KEY)
+        await second.set_data(KEY, {"weight": 70})
+        return state, await first.get_data(KEY)
+
+    assert run_backend(scenario) == ("ProfileSetup:city", {"weight": 70})
@@ -0,0 +1,25 @@
+import json
+import logging
+import sys
+
+from bot.utils.logging import JsonFormatter, TEXT_FORMAT, queue_handler
+
+
+def _record_with_exception():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.getLogger("test").makeRecord("test", logging.ERROR, __file__, 1, "failed %s", ("twice",),
+                                                      sys.exc_info())
+    return queue_handler.prepare(record)
+
+
+def test_json_formatter_gets_exception_through_queue():
+    payload = json.loads(JsonFormatter().format(_record_with_exception()))
+    assert payload["message"] == "failed twice"
+    assert "ValueError: boom" in payload["exc_info"]
+
+
+def test_text_formatter_prints_traceback_once():
+    text = logging.Formatter(TEXT_FORMAT).format(_record_with_exception())
+    assert text.count("ValueError: boom") == 1
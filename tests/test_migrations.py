@@ -0,0 +1,85 @@
+import asyncio
+import sqlite3
+
+from bot.db import crud, pool as pool_module
+from bot.db.migrations import migrate
+from bot.db.pool import create_pool
+
+
+def _legacy_database(path):
+    # Схема users до появления custom_water_goal
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT, weight INTEGER,
+                                        height INTEGER, age INTEGER, activity INTEGER, city TEXT,
+                                        water_goal INTEGER, calorie_goal INTEGER)''')
+    # Цель первого пользователя задана вручную, остальные посчитаны по формуле без жары и с ней
+    conn.executemany("INSERT INTO users VALUES (?, 'user', 70, 180, 30, 45, 'Порту', ?, 2000)",
+                     [(1, 3000), (3, 2850), (4, 3350)])
+    conn.commit()
+    conn.close()
+
+
+def _migrate(path):
+    async def main():
+        pool = create_pool(path, 1, crud.SQLITE_PRAGMAS)
+        try:
+            await migrate(pool)
+        finally:
+            await pool.aclose()
+
+    asyncio.run(main())
+
+
+def test_edited_water_goals_are_kept_as_custom(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    _legacy_database(path)
+    _migrate(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("INSERT INTO users (user_id, water_goal) VALUES (2, 2500)")
+        rows = conn.execute('SELECT user_id, custom_water_goal FROM users ORDER BY user_id').fetchall()
+    finally:
+        conn.close()
+    # Пересчет не должен перезаписать цель, которую пользователь мог задать до появления флага
+    assert rows == [(1, 1), (2, 0), (3, 0), (4, 0)]
+
+
+def _trace_statements(monkeypatch):
+    statements = []
+    connect = sqlite3.connect
+
+    def traced(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(pool_module.sqlite3, "connect", traced)
+    return statements
+
+
+def _pragma(path, name):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"PRAGMA {name}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_new_database_gets_incremental_auto_vacuum(tmp_path, monkeypatch):
+    statements = _trace_statements(monkeypatch)
+    path = str(tmp_path / "new.db")
+    _migrate(path)
+    assert _pragma(path, "auto_vacuum") == 2
+    assert _pragma(path, "journal_mode") == "wal"
+    assert not [statement for statement in statements if statement.upper().startswith("VACUUM")]
+
+
+def test_existing_database_is_not_vacuumed_on_startup(tmp_path, monkeypatch):
+    path = str(tmp_path / "legacy.db")
+    _legacy_database(path)
+    statements = _trace_statements(monkeypatch)
+    _migrate(path)
+    # Перестройка старой базы — только явно, через compaction --enable-incremental-vacuum
+    assert not [statement for statement in statements if statement.upper().startswith("VACUUM")]
+    assert not [statement for statement in statements if "auto_vacuum =" in statement]
+    assert _pragma(path, "auto_vacuum") == 0
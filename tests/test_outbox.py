@@ -0,0 +1,142 @@
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot.utils.outbox import BULK, INTERACTIVE, OutboundDispatcher
+
+
+def _outbox(concurrency=10, max_retries=2):
+    return OutboundDispatcher(global_rate=1000, chat_rate=1000, chat_burst=100, concurrency=concurrency,
+                              max_retries=max_retries, max_chats=100)
+
+
+def _call(sent, name, delay=0):
+    async def call():
+        await asyncio.sleep(delay)
+        sent.append(name)
+        return name
+
+    return call
+
+
+def test_messages_of_one_chat_keep_order():
+    sent = []
+
+    async def scenario():
+        outbox = _outbox()
+        outbox.start()
+        # Первое сообщение отправляется дольше второго, но чат получает их по порядку
+        futures = [outbox.submit(1, _call(sent, "first", delay=0.05)),
+                   outbox.submit(1, _call(sent, "second")),
+                   outbox.submit(2, _call(sent, "other chat"))]
+        results = await asyncio.gather(*futures)
+        await outbox.stop(1)
+        return results
+
+    assert asyncio.run(scenario()) == ["first", "second", "other chat"]
+    assert sent == ["other chat", "first", "second"]
+
+
+def test_interactive_replies_go_ahead_of_bulk():
+    sent = []
+
+    async def scenario():
+        outbox = _outbox(concurrency=1)
+        futures = [outbox.submit(chat_id, _call(sent, f"bulk {chat_id}"), BULK) for chat_id in range(3)]
+        futures.append(outbox.submit(10, _call(sent, "reply"), INTERACTIVE))
+        outbox.start()
+        await asyncio.gather(*futures)
+        await outbox.stop(1)
+
+    asyncio.run(scenario())
+    assert sent == ["reply", "bulk 0", "bulk 1", "bulk 2"]
+
+
+def test_retry_after_blocks_chat_and_retries():
+    sent = []
+    attempts = []
+
+    async def flooded():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise TelegramRetryAfter(method=None, message="Too Many Requests", retry_after=0.2)
+        sent.append("flooded")
+
+    async def scenario():
+        outbox = _outbox()
+        outbox.start()
+        first = outbox.submit(1, flooded)
+        await asyncio.sleep(0.05)
+        futures = [first, outbox.submit(1, _call(sent, "same chat")), outbox.submit(2, _call(sent, "other chat"))]
+        await asyncio.sleep(0.01)
+        blocked = set(outbox._blocked)
+        await asyncio.gather(*futures)
+        await outbox.stop(1)
+        return blocked
+
+    assert asyncio.run(scenario()) == {1}
+    # Другой чат не ждет, сообщения заблокированного чата уходят после повтора
+    assert sent == ["other chat", "flooded", "same chat"]
+    assert attempts[1] - attempts[0] >= 0.2
+
+
+def test_edit_text_waits_for_pending_answer():
+    calls = []
+
+    class Message:
+        def __init__(self, text):
+            self.text = text
+
+        async def edit_text(self, text):
+            calls.append(("edit", self.text, text))
+            return Message(text)
+
+    async def scenario():
+        outbox = _outbox()
+
+        async def answer():
+            calls.append(("answer", "Загрузка..."))
+            return Message("Загрузка...")
+
+        pending = outbox.submit(1, answer)
+        edited = outbox.edit_text(pending, "Готово", chat_id=1)
+        outbox.start()
+        result = await edited
+        await outbox.stop(1)
+        return result.text
+
+    assert asyncio.run(scenario()) == "Готово"
+    assert calls == [("answer", "Загрузка..."), ("edit", "Загрузка...", "Готово")]
+
+
+def test_stop_cancels_dropped_messages():
+    sent = []
+
+    async def scenario():
+        outbox = _outbox()
+        outbox.start()
+        in_flight = outbox.submit(1, _call(sent, "slow", delay=10))
+        await asyncio.sleep(0.01)
+        queued = outbox.submit(1, _call(sent, "queued"))
+        await outbox.stop(0.05)
+        return in_flight, queued, outbox.pending
+
+    in_flight, queued, pending = asyncio.run(scenario())
+    assert sent == []
+    assert in_flight.cancelled() and queued.cancelled()
+    assert pending == 0
+
+
+def test_stop_drops_messages_never_dispatched():
+    async def scenario():
+        outbox = _outbox()
+        futures = [outbox.submit(1, _call([], "never sent"), BULK) for _ in range(3)]
+        await outbox.stop(0)
+        return futures
+
+    futures = asyncio.run(scenario())
+    assert all(future.cancelled() for future in futures)
+    with pytest.raises(asyncio.CancelledError):
+        futures[0].result()
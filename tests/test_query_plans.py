@@ -0,0 +1,37 @@
+import pytest
+
+from bot.db import crud
+from bot.db.migrations import LOG_TABLES
+
+
+def _plan(conn, query, params):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def _assert_no_scan(plan):
+    assert plan
+    assert not [step for step in plan if step.startswith("SCAN")], plan
+
+
+@pytest.mark.parametrize("query, params", [
+    (crud.DAILY_TOTALS_QUERY, (1, "2026-01-01")),
+    (crud.TOTALS_RANGE_QUERY, (1, "2026-01-01", "2026-01-31")),
+])
+def test_daily_totals_reads_use_primary_key(run_db, query, params):
+    plan = run_db(lambda: crud.pool.read(_plan, query, params))
+    _assert_no_scan(plan)
+    assert any("sqlite_autoindex_daily_totals_1" in step for step in plan), plan
+    # Диапазон уже упорядочен по ключу, отдельная сортировка не нужна
+    assert not [step for step in plan if "TEMP B-TREE" in step], plan
+
+
+@pytest.mark.parametrize("table", LOG_TABLES)
+@pytest.mark.parametrize("condition, params", [
+    ("day = ?", (1, "2026-01-01")),
+    ("day BETWEEN ? AND ?", (1, "2026-01-01", "2026-01-31")),
+])
+def test_log_lookups_use_user_day_index(run_db, table, condition, params):
+    query = f"SELECT * FROM {table} WHERE user_id = ? AND {condition}"
+    plan = run_db(lambda: crud.pool.read(_plan, query, params))
+    _assert_no_scan(plan)
+    assert any(f"idx_{table}_user_day" in step for step in plan), plan
@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+from bot.db import crud
+from bot.utils.reminders import ReminderScheduler
+
+USERS = range(1, 21)
+
+
+def _scheduler(sent):
+    async def send(user_id, water_left):
+        sent.append((user_id, water_left))
+
+    return ReminderScheduler(send, interval=3600, start_hour=0, end_hour=24, batch_size=3, poll_interval=0.05)
+
+
+def test_each_reminder_is_sent_once_by_one_of_the_processes(run_backend):
+    sent = []
+
+    async def scenario():
+        for user_id in USERS:
+            await crud.add_user(user_id, "user", 70, 180, 30, 45, "Порту", 2000, 2000)
+        # У удаленного профиля напоминание снимается, а не отправляется
+        await crud.save_reminder(99, int(time.time()) - 60)
+        schedulers = [_scheduler(sent), _scheduler(sent)]
+        for scheduler in schedulers:
+            await scheduler.start()
+        for user_id in USERS:
+            await schedulers[user_id % 2].schedule(user_id, due_at=int(time.time()) - 60)
+        for _ in range(100):
+            if len(sent) == len(USERS):
+                break
+            await asyncio.sleep(0.02)
+        await asyncio.sleep(0.1)
+        for scheduler in schedulers:
+            await scheduler.stop()
+        return (await schedulers[0].is_enabled(1), await schedulers[1].is_enabled(99),
+                await crud.next_reminder_due())
+
+    enabled, deleted_enabled, next_due = run_backend(scenario)
+    assert sorted(sent) == [(user_id, 2000) for user_id in USERS]
+    assert (enabled, deleted_enabled) == (True, False)
+    # Отправленные напоминания перенесены на следующий интервал
+    assert next_due > time.time()
@@ -0,0 +1,48 @@
+import asyncio
+
+from aiogram import types
+from aiogram.dispatcher.event.bases import UNHANDLED
+
+from bot.utils.throttling import ThrottlingMiddleware, TokenBucketLimiter
+
+
+class FakeOutbox:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, chat_id, call, priority=0):
+        self.submitted.append((chat_id, call))
+
+
+def _message(user_id, text):
+    return types.Message.model_validate({
+        "message_id": 1,
+        "date": 0,
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "user"},
+        "text": text,
+    })
+
+
+def test_throttled_warning_goes_through_outbox():
+    outbox = FakeOutbox()
+    middleware = ThrottlingMiddleware(
+        limiters={"default": TokenBucketLimiter(0.001, 1, 100)},
+        upstream_commands=set(),
+        upstream_states=set(),
+        outbox=outbox,
+    )
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event.text)
+        return True
+
+    async def scenario():
+        return [await middleware(handler, _message(7, f"/log_water {i}"), {}) for i in range(3)]
+
+    results = asyncio.run(scenario())
+    assert results == [True, UNHANDLED, UNHANDLED]
+    assert handled == ["/log_water 0"]
+    # Одно предупреждение на серию, и оно ставится в очередь, а не отправляется напрямую
+    assert [chat_id for chat_id, _ in outbox.submitted] == [7]
@@ -0,0 +1,37 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from bot.utils import calculation
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_fetch_weather_without_key_raises_value_error(monkeypatch):
+    # Без ключа set_city должен получить ValueError, а не TypeError из aiohttp
+    monkeypatch.setattr(calculation, "WEATHER_API_KEY", None)
+    with pytest.raises(ValueError):
+        asyncio.run(calculation.fetch_weather("Москва"))
+
+
+def test_calculation_imports_without_database():
+    # Пул создается лениво: расчеты импортируются без DATABASE_URL, а запрос к базе дает понятную ошибку
+    env = {key: value for key, value in os.environ.items() if key != "DATABASE_URL"}
+    code = ("import asyncio\n"
+            "from bot.utils import calculation\n"
+            "from bot.db import crud\n"
+            "try:\n"
+            "    asyncio.run(crud.get_cached_food('банан'))\n"
+            "except RuntimeError as e:\n"
+            "    print(e)\n")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env={**env, "PYTHONPATH": _pythonpath()},
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "DATABASE_URL is not set"
+
+
+def _pythonpath():
+    return os.pathsep.join(filter(None, [ROOT, os.getenv("PYTHONPATH")]))
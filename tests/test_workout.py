@@ -0,0 +1,34 @@
+import pytest
+
+from bot.handlers.settings_handler import split_workout_args
+from bot.utils.calculation import DEFAULT_MET, calculate_exercise_calories, calories_for_met
+from bot.utils.exercises import find_exercise
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("бег 30", ("бег", "30")),
+    ("бег 30 мин", ("бег", "30")),
+    ("бег трусцой 45 минут", ("бег трусцой", "45")),
+    ("велосипед 2 раза 60", ("велосипед 2 раза", "60")),
+    ("плавание полчаса", ("плавание", "полчаса")),
+])
+def test_split_workout_args(text, expected):
+    assert split_workout_args(text.split()) == expected
+
+
+@pytest.mark.parametrize("text", ["", "бег", "30", "30 мин"])
+def test_split_workout_args_without_name_or_duration(text):
+    assert split_workout_args(text.split()) is None
+
+
+def test_calories_for_met():
+    assert calories_for_met(8.0, 30, 70) == pytest.approx(8.0 * 3.5 * 70 / 200 * 30)
+    assert calories_for_met(DEFAULT_MET, 30, None) == pytest.approx(DEFAULT_MET * 3.5 * 70 / 200 * 30)
+
+
+def test_exercise_calories_by_name():
+    _, met = find_exercise("бег")
+    assert calculate_exercise_calories("бег", 30, 70) == pytest.approx(calories_for_met(met, 30, 70))
+    assert calculate_exercise_calories("неизвестное занятие", 30, 70) == pytest.approx(
+        calories_for_met(DEFAULT_MET, 30, 70)
+    )
@@ -0,0 +1,57 @@
+import asyncio
+
+from bot.db.writer import LogWriter
+
+KEY = (1, "2026-01-01")
+
+
+def test_stop_waits_for_flush_in_progress():
+    flushed = []
+
+    async def scenario():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def flush(entries):
+            started.set()
+            await release.wait()
+            flushed.extend(entries)
+
+        writer = LogWriter(flush, flush_interval=60, max_rows=1, durable=True)
+        writer.start()
+        submitted = asyncio.create_task(writer.submit("entry", KEY, {"water_ml": 250}))
+        await started.wait()
+        stopping = asyncio.create_task(writer.stop())
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.wait_for(stopping, 1)
+        # Ждущий durable-записи получает результат, а не зависает
+        await asyncio.wait_for(submitted, 1)
+        return writer.pending_totals(KEY)
+
+    assert asyncio.run(scenario()) == {}
+    assert flushed == ["entry"]
+
+
+def test_read_retries_when_flush_lands_mid_read():
+    stored = {"water_ml": 0}
+
+    async def scenario():
+        async def flush(entries):
+            stored["water_ml"] += 250 * len(entries)
+
+        writer = LogWriter(flush, flush_interval=60, max_rows=100)
+        await writer.submit("entry", KEY, {"water_ml": 250})
+        reads = []
+
+        async def read():
+            reads.append(stored["water_ml"])
+            if len(reads) == 1:
+                # Пакет записывается после того, как чтение уже увидело старое значение
+                await writer.flush()
+            return reads[-1]
+
+        return await writer.read(read, KEY), reads
+
+    (row, pending), reads = asyncio.run(scenario())
+    assert reads == [0, 250]
+    assert (row, pending) == (250, {})